@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the quadratic approximation pricer in
+AmericanOptionCommodities.
+
+Micro-benchmarks time every stage of the pipeline (roots, SeedPrices,
+Critical_Call_Price, Critical_Put_Price, American_Call, American_Put,
+Ame_Option_Price) on a single parameter set, and end-to-end scenarios price a
+single option (also from a precomputed Model_Context), one strike chain, a
+chain table, the main() grid on the reference lattice and 1e4/1e6-row grids
+(also puts only, with the Ju-Zhong and Bjerksund-Stensland engines, and on
+the numba backend when it is installed).
+Every benchmark records wall time, per-call (or per-option) latency
+percentiles and peak traced memory. Results are written as JSON and can be
+compared against a stored baseline run:
+
+    python AmericanOptionBenchmark.py --out bench.json
+    python AmericanOptionBenchmark.py --out new.json --baseline bench.json
+"""
+###########################################################
+### Imports
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+import AmericanOptionCommodities as aoc
+
+###########################################################
+### dResult= Time_Function(fFunc, lArgs, iRepeat, dOptions)
+def Time_Function(fFunc, lArgs, iRepeat, dOptions=1):
+    '''
+    Run fFunc(*lArgs) iRepeat times and summarise the wall time of each run,
+    its latency percentiles per option (dOptions options per run) and the
+    peak memory traced during one extra run.
+    '''
+    fFunc(*lArgs)                           #warm up
+
+    vTimes= np.empty(iRepeat)
+    for i in range(iRepeat):
+        dStart=   time.perf_counter()
+        fFunc(*lArgs)
+        vTimes[i]= time.perf_counter() - dStart
+
+    tracemalloc.start()
+    fFunc(*lArgs)
+    [_, iPeak]= tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    vLatency= vTimes/dOptions
+    return {'repeat':         iRepeat,
+            'options':        dOptions,
+            'wall_total_s':   float(vTimes.sum()),
+            'wall_mean_s':    float(vTimes.mean()),
+            'latency_p50_us': float(np.percentile(vLatency, 50)*1e6),
+            'latency_p90_us': float(np.percentile(vLatency, 90)*1e6),
+            'latency_p99_us': float(np.percentile(vLatency, 99)*1e6),
+            'peak_memory_mb': iPeak/2**20}
+
+###########################################################
+### dResults= Micro_Benchmarks(iRepeat)
+def Micro_Benchmarks(iRepeat=1000):
+    '''
+    Per-function timings on the first parameter set of main().
+    '''
+    [db, iX, dT, dr, ds, dS]= [-0.04, 100, 0.25, 0.08, 0.2, 100.0]
+
+    lq_inf=      aoc.roots(db, dr, np.inf, ds)
+    lq=          aoc.roots(db, dr, dT, ds)
+    lSeedPrices= aoc.SeedPrices(lq_inf, db, dT, ds, iX)
+    dCrit_Call=  aoc.Critical_Call_Price(lSeedPrices, lq, iX, db, ds, dT, dr)
+    dCrit_Put=   aoc.Critical_Put_Price(lSeedPrices, lq, iX, db, ds, dT, dr)
+
+    lCases= [('roots',               aoc.roots, [db, dr, dT, ds]),
+             ('SeedPrices',          aoc.SeedPrices, [lq_inf, db, dT, ds, iX]),
+             ('Critical_Call_Price', aoc.Critical_Call_Price,
+              [lSeedPrices, lq, iX, db, ds, dT, dr]),
+             ('Critical_Put_Price',  aoc.Critical_Put_Price,
+              [lSeedPrices, lq, iX, db, ds, dT, dr]),
+             ('American_Call',       aoc.American_Call,
+              [dS, lq, dCrit_Call, iX, db, ds, dT, dr]),
+             ('American_Put',        aoc.American_Put,
+              [dS, lq, dCrit_Put, iX, db, ds, dT, dr]),
+             ('Ame_Option_Price',    aoc.Ame_Option_Price,
+              [np.array([dT]), np.array([dr]), np.array([ds]), db, iX,
+               np.array([dS])])]
+
+    return {sName: Time_Function(fFunc, lArgs, iRepeat)
+            for (sName, fFunc, lArgs) in lCases}
+
+###########################################################
+### lGrid= Random_Grid(iRows, iSeed)
+def Random_Grid(iRows, iSeed=0):
+    '''
+    Reproducible random (T, r, sigma) rows.
+    '''
+    oRng= np.random.default_rng(iSeed)
+    return [oRng.uniform(0.05, 3.0, iRows), oRng.uniform(0.01, 0.10, iRows),
+            oRng.uniform(0.10, 0.60, iRows)]
+
+###########################################################
+### dResults= Scenario_Benchmarks(bLarge, iRepeat)
+def Scenario_Benchmarks(bLarge=True, iRepeat=5):
+    '''
+    End-to-end scenarios: one option (also repriced from a Model_Context, as
+    on every spot tick), one 41-strike chain, a contract table of 40 such
+    chains for calls and puts, the main() grid on the reference lattice, and
+    grids of 1e4 (and with bLarge 1e6) parameter rows at a single commodity
+    price.
+    '''
+    [db, iX, dS]= [-0.04, 100, 100.0]
+    vX=           np.linspace(60, 140, 41)
+
+    dResults= {}
+    dResults['single_option']= Time_Function(
+        aoc.Ame_Option_Price_Array, [[0.25], [0.08], [0.2], db, iX, [dS]], 200*iRepeat)
+    dResults['single_option_context']= Time_Function(
+        aoc.Model_Context(0.25, 0.08, 0.2, db, iX).price, [dS], 200*iRepeat)
+    dResults['chain_41_strikes']= Time_Function(
+        aoc.Ame_Option_Chain_Price, [[0.25], [0.08], [0.2], db, vX, dS], 20*iRepeat,
+        len(vX))
+
+    #40 expiries x 41 strikes x call/put as a contract table
+    [vT, vX_Table, vCall]= [x.ravel() for x in np.meshgrid(np.linspace(0.05, 2.0, 40), vX,
+                                                           [True, False], indexing='ij')]
+    dResults['chain_table_3280_contracts']= Time_Function(
+        aoc.Ame_Option_Table_Price, [vT, 0.08, 0.2, db, vX_Table, dS, vCall], 20*iRepeat,
+        len(vT))
+    dResults['main_grid_lattice']= Time_Function(
+        aoc.Ame_Option_Price_Array, [[0.25, 0.25, 0.25, 0.5], [0.08, 0.12, 0.08, 0.08],
+                                     [0.2, 0.2, 0.4, 0.2], db, iX, [80, 90, 100, 110, 120],
+                                     None, 1, None, False, None, 'lattice'], iRepeat, 20)
+    
+    lSizes= [10**4, 10**6] if bLarge else [10**4]
+    for iRows in lSizes:
+        [vT, vr, vs]= Random_Grid(iRows)
+        dResults['grid_%d_rows' % iRows]= Time_Function(
+            aoc.Ame_Option_Price_Array, [vT, vr, vs, db, iX, [dS]],
+            iRepeat if iRows < 10**6 else 1, iRows)
+        dResults['grid_%d_rows_puts' % iRows]= Time_Function(
+            aoc.Ame_Option_Price_Array, [vT, vr, vs, db, iX, [dS], None, 1, None,
+                                         False, None, 'baw', 'put'],
+            iRepeat if iRows < 10**6 else 1, iRows)
+        dResults['grid_%d_rows_jz' % iRows]= Time_Function(
+            aoc.Ame_Option_Price_Array, [vT, vr, vs, db, iX, [dS], None, 1, None,
+                                         False, None, 'jz'],
+            iRepeat if iRows < 10**6 else 1, iRows)
+        dResults['grid_%d_rows_bs2002' % iRows]= Time_Function(
+            aoc.Ame_Option_Price_Array, [vT, vr, vs, db, iX, [dS], None, 1, None,
+                                         False, None, 'bs2002'],
+            iRepeat if iRows < 10**6 else 1, iRows)
+        if aoc.Numba_Kernels('numba') is not None:
+            dResults['grid_%d_rows_numba' % iRows]= Time_Function(
+                aoc.Ame_Option_Price_Array, [vT, vr, vs, db, iX, [dS], None, 1, None,
+                                             False, 'numba'],
+                iRepeat if iRows < 10**6 else 1, iRows)
+
+    return dResults
+
+###########################################################
+### dRun= Run_Benchmarks(bLarge, iRepeat)
+def Run_Benchmarks(bLarge=True, iRepeat=1000):
+    '''
+    Full benchmark run with the library versions it was measured on.
+    '''
+    return {'environment': {'python':   platform.python_version(),
+                            'numpy':    np.__version__,
+                            'scipy':    scipy.__version__,
+                            'platform': platform.platform(),
+                            'time':     time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'micro':       Micro_Benchmarks(iRepeat),
+            'scenarios':   Scenario_Benchmarks(bLarge)}
+
+###########################################################
+### lRegressions= Compare_Results(dRun, dBaseline, dThreshold)
+def Compare_Results(dRun, dBaseline, dThreshold=0.2):
+    '''
+    Print the median latency of every benchmark next to the baseline and
+    return the benchmarks that are more than dThreshold (relative) slower.
+    '''
+    lRegressions= []
+    for sGroup in ('micro', 'scenarios'):
+        for (sName, dResult) in dRun[sGroup].items():
+            dBase= dBaseline.get(sGroup, {}).get(sName)
+            if dBase is None:
+                print('%-32s %12.2f us   (no baseline)' % (sName, dResult['latency_p50_us']))
+                continue
+            dRatio= dResult['latency_p50_us']/dBase['latency_p50_us']
+            print('%-32s %12.2f us   baseline %12.2f us   x%.2f'
+                  % (sName, dResult['latency_p50_us'], dBase['latency_p50_us'], dRatio))
+            if dRatio > 1 + dThreshold:
+                lRegressions.append(sName)
+
+    return lRegressions
+
+###########################################################
+### main()
+def main():
+    oParser= argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    oParser.add_argument('--out', default='bench_output.json',
+                         help='JSON file to write the results to')
+    oParser.add_argument('--baseline', help='JSON file of an earlier run to compare with')
+    oParser.add_argument('--threshold', type=float, default=0.2,
+                         help='relative slowdown reported as a regression')
+    oParser.add_argument('--quick', action='store_true',
+                         help='skip the 1e6-row grid and use fewer repeats')
+    oArgs= oParser.parse_args()
+
+    dRun= Run_Benchmarks(bLarge=not oArgs.quick,
+                         iRepeat=100 if oArgs.quick else 1000)
+    with open(oArgs.out, 'w') as oFile:
+        json.dump(dRun, oFile, indent=2)
+
+    if oArgs.baseline:
+        with open(oArgs.baseline) as oFile:
+            dBaseline= json.load(oFile)
+        lRegressions= Compare_Results(dRun, dBaseline, oArgs.threshold)
+        if lRegressions:
+            print('Regressions: ' + ', '.join(lRegressions))
+            raise SystemExit(1)
+    else:
+        for sGroup in ('micro', 'scenarios'):
+            for (sName, dResult) in dRun[sGroup].items():
+                print('%-32s %12.2f us   peak %8.2f MB'
+                      % (sName, dResult['latency_p50_us'], dResult['peak_memory_mb']))
+
+
+###########################################################
+### start main
+if __name__ == "__main__":
+    main()
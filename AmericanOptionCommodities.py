@@ -5,32 +5,115 @@ Created on Tue Apr 21 19:53:23 2020
 The equations come from the paper "Efficient Analytic Approximation of American
 Option Values" from Barone-adesi, 1987.
 
+The BS2002_* functions implement the closed-form alternative of Bjerksund and
+Stensland, "Closed Form Valuation of American Options", 2002, Ju_Zhong_Grid the
+correction of Ju and Zhong, "An Approximate Formula for Pricing American
+Options", 1999, and Lattice_Price the binomial trees of Cox, Ross and
+Rubinstein (1979) and Leisen and Reimer (1996) used as reference.
+
 @author: Francisco Zambrano (2653108)
 """
 ###########################################################
 ### Imports
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import numpy as np
 import pandas as pd
-import scipy.stats as st
+import scipy.interpolate as si
+import scipy.special as sp
+
+###########################################################
+### Backend
+#Batch pricers run on 'numpy' or, when numba is installed, on the compiled
+#kernels of AmericanOptionNumba ('numba'). The default can be chosen at import
+#with the AMOPTION_BACKEND environment variable or later with Set_Backend.
+sBackend= os.environ.get('AMOPTION_BACKEND', 'numpy')
+_oNumba=  None
+
+###########################################################
+### Set_Backend(sName)
+def Set_Backend(sName):
+    '''
+    Select the default backend, 'numpy' or 'numba'.
+    '''
+    global sBackend
+    if sName not in ('numpy', 'numba'):
+        raise ValueError("sName must be 'numpy' or 'numba', got %r" % sName)
+    sBackend= sName
+
+###########################################################
+### oKernels= Numba_Kernels(sName)
+def Numba_Kernels(sName=None):
+    '''
+    The compiled kernel module when backend sName (default: the module
+    default) is 'numba' and numba can be imported, None otherwise so that the
+    caller falls back to the NumPy path.
+    '''
+    global _oNumba
+    if (sName or sBackend) != 'numba':
+        return None
+    if _oNumba is None:
+        try:
+            import AmericanOptionNumba
+            _oNumba= AmericanOptionNumba
+        except ImportError:
+            _oNumba= False
+    return _oNumba or None
+
+###########################################################
+### vN= Norm_CDF(vx)
+def Norm_CDF(vx):
+    '''
+    Standard normal cumulative distribution function N(x), for scalars and
+    arrays, without the overhead of the scipy.stats distribution object.
+    '''
+    return sp.ndtr(vx)
+
+###########################################################
+### vn= Norm_PDF(vx)
+def Norm_PDF(vx):
+    '''
+    Standard normal density function n(x), for scalars and arrays.
+    '''
+    return np.exp(-0.5*np.square(vx))/np.sqrt(2*np.pi)
 
 ###########################################################
 ### vq= roots(db, dr, dT, ds)
 def roots(db, dr, dT, ds):
     '''
     roots of equation (13)
+    
+    Closed-form solution of q**2 + (N-1)*q - M/K = 0, valid for scalars and
+    arrays alike. dT= np.inf gives the perpetual roots used for the seeds.
     '''
+    [db, dr, dT, ds]= Broadcast_Params(db, dr, dT, ds)
     
     dN= 2*db/ds**2
     dM= 2*dr/ds**2
-    dK= 1 - np.exp(-dr*dT)
     
-    a= 1
+    #M/K, with its limit 2/(s^2 T) for r= 0 (K is 0*inf for r= 0, T= inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dK=   -np.expm1(-dr*dT)
+        dM_K= np.where(dr == 0, 2/(ds**2*dT), dM/dK)
+    
     b= dN - 1
-    c= -dM/dK
+    dD= np.sqrt(b**2 + 4*dM_K)
     
-    [q_2, q_1]= np.roots([a, b, c])
+    #Take the root without cancellation first; the product q_1*q_2= -M/K
+    #gives the other one
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q_1= np.where(b >= 0, -(b + dD)/2, 0.0)
+        q_2= np.where(b < 0, (dD - b)/2, 0.0)
+        q_1= np.where(b < 0, np.where(q_2 != 0, -dM_K/q_2, 0.0), q_1)
+        q_2= np.where(b >= 0, np.where(q_1 != 0, -dM_K/q_1, 0.0), q_2)
     
-    return [q_1, q_2]
+    return [q_1[()], q_2[()]]
 
 ###########################################################
 ### [dCall_seed, dPut_seed]= SeedPrices(lq_inf, db, dT, ds, iX)
@@ -40,116 +123,895 @@ def SeedPrices(lq_inf, db, dT, ds, iX):
     iterative procedure (Section II, A).
     '''
     [q_1, q_2]= lq_inf
-    #eq (30)
-    dCall_S_inf= iX/(1-1/q_2)
-    #eq (32)
-    dPut_S_inf=  iX/(1-1/q_1)
+    #Without perpetual early exercise (q_2= 1 or q_1= 0) S_inf is infinite
+    #or 0; the seeds then either stay defined or belong to rows the solvers
+    #skip, see No_Early_Exercise
+    with np.errstate(divide='ignore', invalid='ignore'):
+        #eq (30)
+        dCall_S_inf= iX/(1-1/q_2)
+        #eq (32)
+        dPut_S_inf=  iX/(1-1/q_1)
+        
+        dh_1= (db*dT - 2*ds*np.sqrt(dT)) * (iX/(iX-dPut_S_inf))
+        dh_2= -(db*dT + 2*ds*np.sqrt(dT)) * (iX/(dCall_S_inf-iX))
+        
+        #A positive exponent (|b|T > 2 sigma sqrt(T), i.e. very low volatility)
+        #would put the seed on the wrong side of the strike; start at X instead
+        dh_1= np.minimum(dh_1, 0)
+        dh_2= np.minimum(dh_2, 0)
+        
+        #eq (31)
+        dCall_seed= iX + (dCall_S_inf - iX)*(1 - np.exp(dh_2))
+        #eq (33)
+        dPut_seed=  dPut_S_inf + (iX - dPut_S_inf)*np.exp(dh_1)
     
-    dh_1= (db*dT - 2*ds*np.sqrt(dT)) * (iX/(iX-dPut_S_inf))
-    dh_2= -(db*dT + 2*ds*np.sqrt(dT)) * (iX/(dCall_S_inf-iX))
+    return [dCall_seed, dPut_seed]
+
+###########################################################
+### [vX, vY, ...]= Broadcast_Params(vX, vY, ...)
+def Broadcast_Params(*args):
+    '''
+    Broadcast scalar or array model inputs against each other and return them
+    as float64 arrays of a common shape.
+    '''
+    return [np.array(x, dtype=float) for x in np.broadcast_arrays(*args)]
+
+###########################################################
+### [vNo_Call, vNo_Put]= No_Early_Exercise(vb, vr)
+def No_Early_Exercise(vb, vr):
+    '''
+    Where the call (b >= max(r, 0)) and the put (r <= 0 and b <= 0) are never
+    exercised early: there the European price is at least the intrinsic
+    value, as e.g. S*exp((b-r)T) - X*exp(-rT) >= S - X for the call.
+    '''
+    [vb, vr]= [np.asarray(x) for x in (vb, vr)]
+    return [vb >= np.maximum(vr, 0), (vr <= 0) & (vb <= 0)]
+
+###########################################################
+### [bCall, bPut]= Side_Flags(sSide)
+def Side_Flags(sSide):
+    '''
+    Whether sSide ('both', 'call' or 'put') asks for the calls and the puts.
+    '''
+    if sSide not in ('both', 'call', 'put'):
+        raise ValueError("sSide must be 'both', 'call' or 'put', got %r" % sSide)
+    return [sSide != 'put', sSide != 'call']
+
+###########################################################
+### oStats= Solver_Stats()
+class Solver_Stats(object):
+    '''
+    Per-solve statistics of Critical_Call_Price and Critical_Put_Price:
+    iteration count, final relative residual, distance between seed and
+    solution (relative to X) and elapsed time of every batch.
     
-    #eq (31)
-    dCall_seed= iX + (dCall_S_inf - iX)*(1 - np.exp(dh_2))
-    #eq (33)
-    dPut_seed=  dPut_S_inf + (iX - dPut_S_inf)*np.exp(dh_1)
+    Recording is opt-in through Enable_Solver_Stats(); while it is disabled
+    the solvers only test one module variable per sweep.
+    '''
+    def __init__(self):
+        self._dRecords= {'call': [], 'put': []}
+        self._oLock=    threading.Lock()
     
-    return [dCall_seed, dPut_seed]
+    def record(self, sSide, viIter, vResidual, vSeed_Dist, dElapsed, dTol):
+        with self._oLock:
+            self._dRecords[sSide].append((viIter, vResidual, vSeed_Dist, dElapsed, dTol))
+    
+    def clear(self):
+        with self._oLock:
+            self._dRecords= {'call': [], 'put': []}
+    
+    def summary(self, sSide):
+        '''
+        Aggregated statistics and histograms of one side ('call' or 'put').
+        '''
+        with self._oLock:
+            lRecords= list(self._dRecords[sSide])
+        if not lRecords:
+            return {'solves': 0}
+        
+        viIter=     np.concatenate([x[0] for x in lRecords])
+        if not viIter.size:
+            return {'solves': 0}
+        vResidual=  np.concatenate([x[1] for x in lRecords])
+        vSeed_Dist= np.concatenate([x[2] for x in lRecords])
+        vConverged= np.concatenate([x[1] <= x[4] for x in lRecords])
+        dElapsed=   sum(x[3] for x in lRecords)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vLog_Res=  np.log10(vResidual[vResidual > 0])
+            vLog_Seed= np.log10(vSeed_Dist[vSeed_Dist > 0])
+        vBins= np.arange(-16, 3)
+        
+        return {'solves':             int(viIter.size),
+                'batches':            len(lRecords),
+                'unconverged':        int((~vConverged).sum()),
+                'elapsed_s':          dElapsed,
+                'us_per_solve':       dElapsed/viIter.size*1e6,
+                'iter_mean':          float(viIter.mean()),
+                'iter_p50':           float(np.percentile(viIter, 50)),
+                'iter_p99':           float(np.percentile(viIter, 99)),
+                'iter_max':           int(viIter.max()),
+                'iter_histogram':     np.bincount(viIter).tolist(),
+                'residual_max':       float(np.nanmax(vResidual)) if np.isfinite(vResidual).any() else np.nan,
+                'residual_log10_bins': vBins.tolist(),
+                'residual_histogram': np.histogram(vLog_Res, vBins)[0].tolist(),
+                'seed_dist_p50':      float(np.nanpercentile(vSeed_Dist, 50)),
+                'seed_dist_max':      float(np.nanmax(vSeed_Dist)),
+                'seed_dist_histogram': np.histogram(vLog_Seed, vBins)[0].tolist()}
+    
+    def report(self):
+        '''
+        Text report of both solvers.
+        '''
+        lLines= []
+        for sSide in ('call', 'put'):
+            dSummary= self.summary(sSide)
+            lLines.append('Critical %s price solver' % sSide)
+            if dSummary['solves'] == 0:
+                lLines.append('  no solves recorded')
+                continue
+            lLines.append('  solves %d in %d batches, %d unconverged, %.2f us per solve'
+                          % (dSummary['solves'], dSummary['batches'],
+                             dSummary['unconverged'], dSummary['us_per_solve']))
+            lLines.append('  iterations mean %.2f, p50 %.0f, p99 %.0f, max %d'
+                          % (dSummary['iter_mean'], dSummary['iter_p50'],
+                             dSummary['iter_p99'], dSummary['iter_max']))
+            lLines.append('  final residual max %.3g, seed distance p50 %.3g, max %.3g'
+                          % (dSummary['residual_max'], dSummary['seed_dist_p50'],
+                             dSummary['seed_dist_max']))
+            lLines.append('  iterations histogram:')
+            for (iIter, iCount) in enumerate(dSummary['iter_histogram']):
+                if iCount:
+                    lLines.append('    %5d  %d' % (iIter, iCount))
+        
+        return '\n'.join(lLines)
+    
+    def save(self, sFile):
+        '''
+        Dump the summaries of both solvers as JSON.
+        '''
+        with open(sFile, 'w') as oFile:
+            json.dump({sSide: self.summary(sSide) for sSide in ('call', 'put')},
+                      oFile, indent=2)
+
+#Active statistics collector of the critical price solvers, None when disabled
+oSolver_Stats= None
+
+###########################################################
+### oStats= Enable_Solver_Stats(oStats)
+def Enable_Solver_Stats(oStats=None):
+    '''
+    Start recording solver statistics into oStats (a new Solver_Stats by
+    default) and return it.
+    '''
+    global oSolver_Stats
+    oSolver_Stats= Solver_Stats() if oStats is None else oStats
+    return oSolver_Stats
+
+###########################################################
+### oStats= Disable_Solver_Stats()
+def Disable_Solver_Stats():
+    '''
+    Stop recording solver statistics and return the collector that was active.
+    '''
+    global oSolver_Stats
+    oStats=        oSolver_Stats
+    oSolver_Stats= None
+    return oStats
 
 ###########################################################
 ### dCrit_Call= Critical_Call_Price(lSeedPrices, lq, iX, db, ds, dT, dr)
-def Critical_Call_Price(lSeedPrices, lq, iX, db, ds, dT, dr):
+def Critical_Call_Price(lSeedPrices, lq, iX, db, ds, dT, dr,
+                        dTol=0.00001, iMax_Iter=1000):
     ''' 
     Finding the critical commodity price throughout the iterative procedure.
+    
+    All inputs may be scalars or arrays of parameters. The elements are
+    iterated together and each one is frozen as soon as its own relative
+    error drops below dTol.
+    
+    Where the call is never exercised early (b >= max(r, 0), see
+    No_Early_Exercise) the elements get an infinite critical price and never
+    enter the iteration; so do elements with r < 0 that end without a root
+    above X.
     '''
     [dCrit_Call, dCrit_Put]= lSeedPrices
     [dq_1, dq_2]=            lq
     
-    dError= 1
-    while dError > 0.00001:
-        # print('Critical Price :',dCrit_Call)
-        d_1= (np.log(dCrit_Call/iX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
-        d_2= d_1 - ds*np.sqrt(dT)
+    [vCrit, vq_2, vX, vb, vs, vT, vr]= Broadcast_Params(dCrit_Call, dq_2, iX,
+                                                        db, ds, dT, dr)
+    vShape= vCrit.shape
+    [vCrit, vq_2, vX, vb, vs, vT, vr]= [x.ravel() for x in (vCrit, vq_2, vX, vb,
+                                                             vs, vT, vr)]
+    #Flat indices of the elements that have not converged yet
+    vNo_Call=        No_Early_Exercise(vb, vr)[0]
+    vSolve=          np.flatnonzero(~vNo_Call)
+    vCrit[vNo_Call]= np.inf
+    vIdx=            vSolve
+    
+    oStats= oSolver_Stats
+    if oStats is not None:
+        dStart=    time.perf_counter()
+        vSeed=     vCrit.copy()
+        viIter=    np.full(vCrit.size, iMax_Iter)
+        vResidual= np.full(vCrit.size, np.nan)
+    
+    iIter= 0
+    while vIdx.size and iIter < iMax_Iter:
+        dCrit=  vCrit[vIdx]
+        q_2=    vq_2[vIdx]
+        X=      vX[vIdx]
+        b=      vb[vIdx]
+        s=      vs[vIdx]
+        T=      vT[vIdx]
+        r=      vr[vIdx]
+        
+        d_1= (np.log(dCrit/X) + (b + 0.5*s**2)*T)/(s*np.sqrt(T))
+        d_2= d_1 - s*np.sqrt(T)
         
         #eq (5)
-        dEU_Call= dCrit_Call*np.exp((db-dr)*dT)*st.norm.cdf(d_1)\
-            - iX*np.exp(-dr*dT)*st.norm.cdf(d_2)
+        dEU_Call= dCrit*np.exp((b-r)*T)*Norm_CDF(d_1)\
+            - X*np.exp(-r*T)*Norm_CDF(d_2)
         
         #Condition to satisfy eq (19)
         #eq (26b)
-        dRHS= dEU_Call + (1-np.exp((db-dr)*dT)*st.norm.cdf(d_1))*dCrit_Call/dq_2
+        dRHS= dEU_Call + (1-np.exp((b-r)*T)*Norm_CDF(d_1))*dCrit/q_2
         #eq (26a)
-        dLHS= dCrit_Call - iX
+        dLHS= dCrit - X
         
         #Condition value
-        dError= abs(dLHS-dRHS)/iX
-        # print('Relative Abs. Error: ',dError)
+        dError= abs(dLHS-dRHS)/X
         
         #eq (27) Finding next guess price:
-        db_i= np.exp((db-dr)*dT)*st.norm.cdf(d_1)*(1 - 1/dq_2)\
-            + (1 - np.exp((db-dr)*dT)*st.norm.pdf(d_1)/ds*np.sqrt(dT))/dq_2
+        db_i= np.exp((b-r)*T)*Norm_CDF(d_1)*(1 - 1/q_2)\
+            + (1 - np.exp((b-r)*T)*Norm_PDF(d_1)/(s*np.sqrt(T)))/q_2
         
         #eq (28)
-        dCrit_Call= (iX + dRHS - db_i*dCrit_Call)/(1 - db_i)
+        vCrit[vIdx]= (X + dRHS - db_i*dCrit)/(1 - db_i)
+        vKeep=       dError > dTol
+        if oStats is not None:
+            vResidual[vIdx]=       dError
+            viIter[vIdx[~vKeep]]= iIter + 1
+        vIdx=        vIdx[vKeep]
+        iIter+= 1
+    
+    if oStats is not None and vSolve.size:
+        oStats.record('call', viIter[vSolve], vResidual[vSolve],
+                      np.abs(vCrit - vSeed)[vSolve]/vX[vSolve],
+                      time.perf_counter() - dStart, dTol)
+    
+    #With r < 0 eq (26) can lack a root above X (the exercise region is then
+    #bounded on both sides); these elements are never exercised in the model
+    vCrit[(vr < 0) & ~(vCrit > vX)]= np.inf
         
-    return dCrit_Call
+    return vCrit.reshape(vShape)[()]
 
 ###########################################################
 ### dCrit_Put= Critical_Put_Price(lSeedPrices, lq, iX, db, ds, dT, dr)
-def Critical_Put_Price(lSeedPrices, lq, iX, db, ds, dT, dr):
+def Critical_Put_Price(lSeedPrices, lq, iX, db, ds, dT, dr,
+                       dTol=0.00001, iMax_Iter=1000):
     ''' 
     Finding the critical commodity price throughout the iterative procedure.
+    
+    All inputs may be scalars or arrays of parameters. The elements are
+    iterated together and each one is frozen as soon as its own relative
+    error drops below dTol.
+    
+    Where the put is never exercised early (r <= 0 and b <= 0, see
+    No_Early_Exercise) the elements get a zero critical price and never
+    enter the iteration; elements with r < 0 that end without a root below
+    X get a zero critical price too.
     '''
     [dCrit_Call, dCrit_Put]= lSeedPrices
     [dq_1, dq_2]=            lq
     
-    dError= 1
-    while dError > 0.00001:
-        d_1= (np.log(dCrit_Put/iX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
-        d_2= d_1 - ds*np.sqrt(dT)
+    [vCrit, vq_1, vX, vb, vs, vT, vr]= Broadcast_Params(dCrit_Put, dq_1, iX,
+                                                        db, ds, dT, dr)
+    vShape= vCrit.shape
+    [vCrit, vq_1, vX, vb, vs, vT, vr]= [x.ravel() for x in (vCrit, vq_1, vX, vb,
+                                                             vs, vT, vr)]
+    #Flat indices of the elements that have not converged yet
+    vNo_Put=        No_Early_Exercise(vb, vr)[1]
+    vSolve=         np.flatnonzero(~vNo_Put)
+    vCrit[vNo_Put]= 0.0
+    vIdx=           vSolve
+    
+    oStats= oSolver_Stats
+    if oStats is not None:
+        dStart=    time.perf_counter()
+        vSeed=     vCrit.copy()
+        viIter=    np.full(vCrit.size, iMax_Iter)
+        vResidual= np.full(vCrit.size, np.nan)
+    
+    iIter= 0
+    while vIdx.size and iIter < iMax_Iter:
+        dCrit=  vCrit[vIdx]
+        q_1=    vq_1[vIdx]
+        X=      vX[vIdx]
+        b=      vb[vIdx]
+        s=      vs[vIdx]
+        T=      vT[vIdx]
+        r=      vr[vIdx]
+        
+        d_1= (np.log(dCrit/X) + (b + 0.5*s**2)*T)/(s*np.sqrt(T))
+        d_2= d_1 - s*np.sqrt(T)
         
         #eq (6)
-        dEU_Put= iX*np.exp(-dr*dT)*st.norm.cdf(-d_2)\
-            - dCrit_Put*np.exp((db-dr)*dT)*st.norm.cdf(-d_1)
+        dEU_Put= X*np.exp(-r*T)*Norm_CDF(-d_2)\
+            - dCrit*np.exp((b-r)*T)*Norm_CDF(-d_1)
         
         #Condition to satisfy eq (24)
-        dRHS= dEU_Put - (1-np.exp((db-dr)*dT)*st.norm.cdf(-d_1))*dCrit_Put/dq_1
-        dLHS= iX - dCrit_Put
+        dRHS= dEU_Put - (1-np.exp((b-r)*T)*Norm_CDF(-d_1))*dCrit/q_1
+        dLHS= X - dCrit
         
         #Condition value
-        dError= abs(dLHS-dRHS)/iX
+        dError= abs(dLHS-dRHS)/X
 
-        #Finding next guess price:
-        db_i= np.exp((db-dr)*dT)*st.norm.cdf(-d_1)*(1 - 1/dq_1)\
-            + (1 - np.exp((db-dr)*dT)*st.norm.pdf(-d_1)/ds*np.sqrt(dT))/dq_1
+        #Finding next guess price (b_i is the slope of the RHS):
+        db_i= -np.exp((b-r)*T)*Norm_CDF(-d_1)*(1 - 1/q_1)\
+            - (1 + np.exp((b-r)*T)*Norm_PDF(-d_1)/(s*np.sqrt(T)))/q_1
             
-        dCrit_Put= (iX + db_i*dCrit_Put - dRHS)/(1 + db_i)
+        vCrit[vIdx]= (X - dRHS + db_i*dCrit)/(1 + db_i)
+        vKeep=       dError > dTol
+        if oStats is not None:
+            vResidual[vIdx]=       dError
+            viIter[vIdx[~vKeep]]= iIter + 1
+        vIdx=        vIdx[vKeep]
+        iIter+= 1
+    
+    if oStats is not None and vSolve.size:
+        oStats.record('put', viIter[vSolve], vResidual[vSolve],
+                      np.abs(vCrit - vSeed)[vSolve]/vX[vSolve],
+                      time.perf_counter() - dStart, dTol)
+    
+    #With r < 0 eq (24) can lack a root below X (the exercise region is then
+    #bounded on both sides); these elements are never exercised in the model
+    vCrit[(vr < 0) & ~(vCrit < vX)]= 0.0
         
-    return dCrit_Put        
+    return vCrit.reshape(vShape)[()]
 
 ###########################################################
-### dAme_Put= American_Put(dS, lq, dCrit_Put, iX, db, ds, dT, dr)
-def American_Put(dS, lq, dCrit_Put, iX, db, ds, dT, dr):
+### [vCrit_Call, vCrit_Put]= Critical_Prices(vb, vr, vT, vs, vX, bContinuation, sBackend, sSide, bSymmetry)
+def Critical_Prices(vb, vr, vT, vs, vX, bContinuation=False, sBackend=None,
+                    sSide='both', bSymmetry=False):
     '''
-    Computing the American Put option price.
+    Critical call and put commodity prices for a whole batch of parameter
+    rows, solved together in one call of each iterative procedure.
+    
+    bContinuation= True seeds the solves from neighbouring rows instead, see
+    Critical_Prices_Continuation. sBackend overrides the module backend.
+    sSide= 'call' or 'put' solves only that side and returns None for the
+    other one. bSymmetry= True takes the put boundary from the call solver,
+    see Critical_Prices_Symmetry.
+    '''
+    [bCall, bPut]= Side_Flags(sSide)
+    if bSymmetry:
+        if bContinuation:
+            raise ValueError('bSymmetry cannot be combined with bContinuation')
+        return Critical_Prices_Symmetry(vb, vr, vT, vs, vX, sSide)
+    if bContinuation:
+        return Critical_Prices_Continuation(vb, vr, vT, vs, vX, sSide=sSide)
+    
+    [vb, vr, vT, vs, vX]= Broadcast_Params(vb, vr, vT, vs, vX)
+    oKernels= Numba_Kernels(sBackend)
+    if oKernels is not None:
+        lCrit= oKernels.Critical_Prices(vb.ravel(), vr.ravel(), vT.ravel(), vs.ravel(),
+                                        vX.ravel(), 0.00001, 1000, bCall, bPut)
+        return [x.reshape(vb.shape)[()] if bSide else None
+                for (x, bSide) in zip(lCrit, (bCall, bPut))]
+    
+    lq_inf= roots(vb, vr, np.inf, vs)
+    lq=     roots(vb, vr, vT, vs)
+    
+    lSeedPrices= SeedPrices(lq_inf, vb, vT, vs, vX)
+    vCrit_Call=  Critical_Call_Price(lSeedPrices, lq, vX, vb, vs, vT, vr) if bCall else None
+    vCrit_Put=   Critical_Put_Price(lSeedPrices, lq, vX, vb, vs, vT, vr) if bPut else None
+    
+    return [vCrit_Call, vCrit_Put]
+
+###########################################################
+### [vCrit_Call, vCrit_Put]= Critical_Prices_Symmetry(vb, vr, vT, vs, vX, sSide)
+def Critical_Prices_Symmetry(vb, vr, vT, vs, vX, sSide='both'):
+    '''
+    Critical call and put commodity prices with both sides solved by
+    Critical_Call_Price, in one batch.
+    
+    By the put-call symmetry of McDonald and Schroder (1998),
+    P(S, X, T, r, b, s)= C(X, S, T, r-b, -b, s), so the put is exercised
+    where S <= X/c' with c' the normalized critical price of a call with
+    rate r-b and cost of carry -b. The quadratic approximation is not exactly
+    symmetric (eq (13) discounts with r, not r-b), so the put boundary differs
+    slightly from the one of Critical_Put_Price unless b= 0; see
+    Put_Call_Symmetry_Error.
+    
+    The stacked rows are deduplicated before the solve, so a put whose
+    transformed parameters (-b, r-b, T, sigma) match a call row (or another
+    put) costs no solve of its own.
     '''
+    [bCall, bPut]=        Side_Flags(sSide)
+    [vb, vr, vT, vs, vX]= Broadcast_Params(vb, vr, vT, vs, vX)
+    [b, r, T, s]=         [x.ravel() for x in (vb, vr, vT, vs)]
     
+    #Calls on (b, r) and transformed calls on (-b, r-b) stacked in one batch,
+    #each distinct parameter set solved once
+    lSides=      [(b, r)]*bCall + [(-b, r - b)]*bPut
+    [b, r]=      [np.concatenate(x) for x in zip(*lSides)]
+    [T, s]=      [np.tile(x, len(lSides)) for x in (T, s)]
+    [[b, r, T, s], vGroup]= Group_Params(b, r, T, s)
+    lSeedPrices= SeedPrices(roots(b, r, np.inf, s), b, T, s, 1.0)
+    vCrit=       Critical_Call_Price(lSeedPrices, roots(b, r, T, s), 1.0, b, s, T, r)
+    vCrit=       np.atleast_1d(vCrit)[vGroup]
+    
+    lCrit=      [x.reshape(vb.shape) for x in np.split(vCrit, len(lSides))]
+    vCrit_Call= (lCrit[0]*vX)[()] if bCall else None
+    vCrit_Put=  (vX/lCrit[-1])[()] if bPut else None
+    
+    return [vCrit_Call, vCrit_Put]
+
+###########################################################
+### [vCrit_Put, vCrit_Sym, vError]= Put_Call_Symmetry_Error(vb, vr, vT, vs)
+def Put_Call_Symmetry_Error(vb, vr, vT, vs):
+    '''
+    Cross-check of the two solvers: the normalized put boundary of
+    Critical_Put_Price, the one obtained from Critical_Call_Price through
+    put-call symmetry, and their relative difference.
+    '''
+    vCrit_Put= Critical_Prices(vb, vr, vT, vs, 1.0, sSide='put')[1]
+    vCrit_Sym= Critical_Prices_Symmetry(vb, vr, vT, vs, 1.0, 'put')[1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vError= np.abs(vCrit_Sym/vCrit_Put - 1)
+    
+    return [vCrit_Put, vCrit_Sym, vError]
+
+###########################################################
+### [vCrit_Call, vCrit_Put]= Critical_Prices_Continuation(vb, vr, vT, vs, vX, iStride, dMax_Gap, sSide)
+def Critical_Prices_Continuation(vb, vr, vT, vs, vX, iStride=8, dMax_Gap=0.25,
+                                 sSide='both'):
+    '''
+    Critical call and put commodity prices for a batch of parameter rows,
+    warm-started along the maturity axis.
+    
+    The rows are sorted by (b, r, sigma, T). Within every (b, r, sigma) group
+    each iStride-th maturity and the longest one are solved first from the
+    SeedPrices seeds. The normalized critical prices of these anchors are
+    interpolated in sqrt(T) to seed the remaining rows, which then need far
+    fewer iterations. Rows whose anchors are more than dMax_Gap apart in
+    sqrt(T), or did not converge, keep the SeedPrices seed. sSide is as in
+    Critical_Prices.
+    '''
+    [bCall, bPut]=        Side_Flags(sSide)
+    [vb, vr, vT, vs, vX]= Broadcast_Params(vb, vr, vT, vs, vX)
+    vShape=      vb.shape
+    vOrder=      np.lexsort((vT.ravel(), vs.ravel(), vr.ravel(), vb.ravel()))
+    [b, r, T, s]= [x.ravel()[vOrder] for x in (vb, vr, vT, vs)]
+    iN=          len(b)
+    viRow=       np.arange(iN)
+    
+    #Group boundaries and anchors (first, every iStride-th and last row)
+    vNew_Group= np.r_[True, (b[1:] != b[:-1]) | (r[1:] != r[:-1]) | (s[1:] != s[:-1])]
+    vLast=      np.r_[vNew_Group[1:], True]
+    viPos=      viRow - np.maximum.accumulate(np.where(vNew_Group, viRow, 0))
+    vAnchor=    (viPos % iStride == 0) | vLast
+    
+    lq_inf=      roots(b, r, np.inf, s)
+    lq=          roots(b, r, T, s)
+    lSeedPrices= SeedPrices(lq_inf, b, T, s, 1.0)
+    vCrit_Call=  np.full(iN, np.nan)
+    vCrit_Put=   np.full(iN, np.nan)
+    
+    lSeeds= [lSeedPrices[0][vAnchor], lSeedPrices[1][vAnchor]]
+    lArgs=  [1.0, b[vAnchor], s[vAnchor], T[vAnchor], r[vAnchor]]
+    lq_Sub= [lq[0][vAnchor], lq[1][vAnchor]]
+    if bCall:
+        vCrit_Call[vAnchor]= Critical_Call_Price(lSeeds, lq_Sub, *lArgs)
+    if bPut:
+        vCrit_Put[vAnchor]=  Critical_Put_Price(lSeeds, lq_Sub, *lArgs)
+    
+    #Interpolate the anchors in sqrt(T) to seed the rows in between
+    vFree= ~vAnchor
+    if vFree.any():
+        viPrev= np.maximum.accumulate(np.where(vAnchor, viRow, 0))[vFree]
+        viNext= np.minimum.accumulate(np.where(vAnchor, viRow, iN)[::-1])[::-1][vFree]
+        vSqrt=  np.sqrt(T)
+        vGap=   vSqrt[viNext] - vSqrt[viPrev]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vW= np.where(vGap > 0, (vSqrt[vFree] - vSqrt[viPrev])/vGap, 0.0)
+        
+        lSeeds= []
+        for (vCrit, vSeed) in ((vCrit_Call, lSeedPrices[0]), (vCrit_Put, lSeedPrices[1])):
+            vWarm=  (1 - vW)*vCrit[viPrev] + vW*vCrit[viNext]
+            vValid= (vGap <= dMax_Gap) & np.isfinite(vWarm)
+            lSeeds.append(np.where(vValid, vWarm, vSeed[vFree]))
+        
+        lArgs=  [1.0, b[vFree], s[vFree], T[vFree], r[vFree]]
+        lq_Sub= [lq[0][vFree], lq[1][vFree]]
+        if bCall:
+            vCrit_Call[vFree]= Critical_Call_Price(lSeeds, lq_Sub, *lArgs)
+        if bPut:
+            vCrit_Put[vFree]=  Critical_Put_Price(lSeeds, lq_Sub, *lArgs)
+    
+    #Back to the input order and scaled to the strikes
+    vCall= np.empty(iN)
+    vPut=  np.empty(iN)
+    vCall[vOrder]= vCrit_Call
+    vPut[vOrder]=  vCrit_Put
+    
+    return [(vCall.reshape(vShape)*vX)[()] if bCall else None,
+            (vPut.reshape(vShape)*vX)[()] if bPut else None]
+
+###########################################################
+### oCache= Critical_Price_Cache(iMax_Size, sPolicy, dQuantum)
+class Critical_Price_Cache(object):
+    '''
+    Bounded, thread-safe cache in front of Critical_Call_Price and
+    Critical_Put_Price.
+    
+    The model is homogeneous of degree one in (S, X), so entries are keyed on
+    the normalized parameters (b, r, T, sigma) and store S*/X for the call
+    and the put; any strike reuses them. dQuantum is one quantum for all four
+    parameters or a sequence of four for (b, r, T, sigma); a parameter with a
+    quantum > 0 is rounded to its multiples for the lookup and the boundary
+    solve only, the strike and the prices themselves stay exact.
+    sPolicy is 'lru' or 'fifo'.
+    '''
+    def __init__(self, iMax_Size=100000, sPolicy='lru', dQuantum=0.0):
+        if sPolicy not in ('lru', 'fifo'):
+            raise ValueError("sPolicy must be 'lru' or 'fifo', got %r" % sPolicy)
+        if iMax_Size < 1:
+            raise ValueError('iMax_Size must be positive')
+        vQuantum= np.asarray(dQuantum, dtype=float)
+        if vQuantum.shape not in ((), (4,)):
+            raise ValueError('dQuantum must be a scalar or one value per (b, r, T, sigma)')
+        
+        self.iMax_Size=  int(iMax_Size)
+        self.sPolicy=    sPolicy
+        self.vQuantum=   np.broadcast_to(vQuantum, (4,)).copy()
+        self.iHits=      0
+        self.iMisses=    0
+        self.iEvictions= 0
+        self._dEntries=  OrderedDict()
+        self._oLock=     threading.Lock()
+    
+    def __len__(self):
+        return len(self._dEntries)
+    
+    def quantize(self, vb, vr, vT, vs):
+        '''
+        Round (b, r, T, sigma) to the cache grid, each with its own quantum
+        (no-op for a quantum of 0).
+        '''
+        return [np.round(np.asarray(x, dtype=float)/dQ)*dQ if dQ > 0 else x
+                for (x, dQ) in zip((vb, vr, vT, vs), self.vQuantum.tolist())]
+    
+    def critical_prices(self, vb, vr, vT, vs, vX):
+        '''
+        Same as Critical_Prices, solving only the parameter rows that are not
+        cached yet (in one batch) and storing them. Only the lookup and the
+        solve use the quantized parameters; S*/X is scaled by the exact vX.
+        '''
+        [vb, vr, vT, vs]=     self.quantize(vb, vr, vT, vs)
+        [vb, vr, vT, vs, vX]= Broadcast_Params(vb, vr, vT, vs, vX)
+        lKeys= list(zip(vb.ravel().tolist(), vr.ravel().tolist(),
+                        vT.ravel().tolist(), vs.ravel().tolist()))
+        
+        mCrit=   np.empty((len(lKeys), 2))
+        lMissed= []
+        with self._oLock:
+            for (i, tKey) in enumerate(lKeys):
+                tCrit= self._dEntries.get(tKey)
+                if tCrit is None:
+                    lMissed.append(i)
+                    continue
+                if self.sPolicy == 'lru':
+                    self._dEntries.move_to_end(tKey)
+                mCrit[i]= tCrit
+            self.iHits+=   len(lKeys) - len(lMissed)
+            self.iMisses+= len(lMissed)
+        
+        if lMissed:
+            vIdx= np.array(lMissed)
+            [vCrit_Call, vCrit_Put]= Critical_Prices(vb.ravel()[vIdx], vr.ravel()[vIdx],
+                                                     vT.ravel()[vIdx], vs.ravel()[vIdx], 1.0)
+            mCrit[vIdx, 0]= vCrit_Call
+            mCrit[vIdx, 1]= vCrit_Put
+            with self._oLock:
+                for (i, dCall, dPut) in zip(lMissed, vCrit_Call.tolist(), vCrit_Put.tolist()):
+                    self._dEntries[lKeys[i]]= (dCall, dPut)
+                while len(self._dEntries) > self.iMax_Size:
+                    self._dEntries.popitem(last=False)
+                    self.iEvictions+= 1
+        
+        vCrit_Call= mCrit[:, 0].reshape(vb.shape)*vX
+        vCrit_Put=  mCrit[:, 1].reshape(vb.shape)*vX
+        
+        return [vCrit_Call[()], vCrit_Put[()]]
+    
+    def stats(self):
+        '''
+        Hit/miss statistics of the cache.
+        '''
+        with self._oLock:
+            iLookups= self.iHits + self.iMisses
+            return {'hits':      self.iHits,
+                    'misses':    self.iMisses,
+                    'evictions': self.iEvictions,
+                    'size':      len(self._dEntries),
+                    'max_size':  self.iMax_Size,
+                    'hit_rate':  self.iHits/iLookups if iLookups else 0.0}
+    
+    def clear(self):
+        '''
+        Drop all entries and reset the statistics.
+        '''
+        with self._oLock:
+            self._dEntries.clear()
+            self.iHits=      0
+            self.iMisses=    0
+            self.iEvictions= 0
+
+###########################################################
+### oSurface= Boundary_Surface(vb, vr, vT, vs, mCrit_Call, mCrit_Put)
+class Boundary_Surface(object):
+    '''
+    Precomputed normalized critical prices S*/X on a (b, r, T, sigma) grid,
+    served by multilinear interpolation.
+    
+    Interpolation runs on log(S*/X) and in sqrt(T) rather than T, where the
+    boundary is much closer to linear. Points outside the grid, or in cells
+    with a corner where the boundary is not finite (no early exercise, or no
+    convergence), fall back to the exact Critical_Prices solve. Points where
+    the call or the put is never exercised early (see No_Early_Exercise) are
+    answered directly with inf and 0.
+    dMax_Error_Call and dMax_Error_Put hold the largest relative error
+    against the exact solver measured at the centres of all grid cells
+    when the surface was built, an estimate of the worst case error.
+    
+    The object offers the same critical_prices interface as
+    Critical_Price_Cache, so it can be passed as oCache to the pricers.
+    '''
+    def __init__(self, vb, vr, vT, vs, mCrit_Call, mCrit_Put,
+                 dMax_Error_Call=np.nan, dMax_Error_Put=np.nan):
+        lAxes= [np.asarray(vb, dtype=float), np.asarray(vr, dtype=float),
+                np.sqrt(np.asarray(vT, dtype=float)), np.asarray(vs, dtype=float)]
+        
+        self.vb=              lAxes[0]
+        self.vr=              lAxes[1]
+        self.vT=              np.asarray(vT, dtype=float)
+        self.vs=              lAxes[3]
+        self.mCrit_Call=      np.asarray(mCrit_Call, dtype=float)
+        self.mCrit_Put=       np.asarray(mCrit_Put, dtype=float)
+        self.dMax_Error_Call= float(dMax_Error_Call)
+        self.dMax_Error_Put=  float(dMax_Error_Put)
+        #NaN nodes make every cell they touch a miss
+        with np.errstate(divide='ignore'):
+            [mLog_Call, mLog_Put]= [np.where(np.isfinite(x), x, np.nan) for x in
+                                    (np.log(self.mCrit_Call), np.log(self.mCrit_Put))]
+        self._oCall=          si.RegularGridInterpolator(lAxes, mLog_Call,
+                                                         bounds_error=False,
+                                                         fill_value=np.nan)
+        self._oPut=           si.RegularGridInterpolator(lAxes, mLog_Put,
+                                                         bounds_error=False,
+                                                         fill_value=np.nan)
+    
+    @classmethod
+    def build(cls, vb, vr, vT, vs):
+        '''
+        Solve the normalized critical prices on the full grid and measure the
+        interpolation error at the cell centres. Maturities spaced evenly in
+        sqrt(T) give the smallest error for a given grid size.
+        '''
+        lAxes=  [np.asarray(x, dtype=float) for x in (vb, vr, vT, vs)]
+        lMesh=  np.meshgrid(*lAxes, indexing='ij')
+        [mCrit_Call, mCrit_Put]= Critical_Prices(lMesh[0], lMesh[1], lMesh[2],
+                                                 lMesh[3], 1.0)
+        oSurface= cls(lAxes[0], lAxes[1], lAxes[2], lAxes[3], mCrit_Call, mCrit_Put)
+        
+        #Cell centres (midpoint in sqrt(T) along the maturity axis)
+        lMid= [(x[1:] + x[:-1])/2 if len(x) > 1 else x for x in lAxes]
+        if len(lAxes[2]) > 1:
+            lMid[2]= ((np.sqrt(lAxes[2][1:]) + np.sqrt(lAxes[2][:-1]))/2)**2
+        lMesh= [x.ravel() for x in np.meshgrid(*lMid, indexing='ij')]
+        [vExact_Call, vExact_Put]= Critical_Prices(*lMesh, 1.0)
+        [vFit_Call, vFit_Put]=     oSurface.interpolate(*lMesh)
+        with np.errstate(invalid='ignore'):
+            oSurface.dMax_Error_Call= np.nanmax(np.abs(vFit_Call/vExact_Call - 1))
+            oSurface.dMax_Error_Put=  np.nanmax(np.abs(vFit_Put/vExact_Put - 1))
+        
+        return oSurface
+    
+    def save(self, sFile):
+        '''
+        Store the surface as a compressed .npz file.
+        '''
+        np.savez_compressed(sFile, vb=self.vb, vr=self.vr, vT=self.vT, vs=self.vs,
+                            mCrit_Call=self.mCrit_Call, mCrit_Put=self.mCrit_Put,
+                            dMax_Error_Call=self.dMax_Error_Call,
+                            dMax_Error_Put=self.dMax_Error_Put)
+    
+    @classmethod
+    def load(cls, sFile):
+        '''
+        Read a surface written by save().
+        '''
+        with np.load(sFile) as dData:
+            return cls(dData['vb'], dData['vr'], dData['vT'], dData['vs'],
+                       dData['mCrit_Call'], dData['mCrit_Put'],
+                       dData['dMax_Error_Call'], dData['dMax_Error_Put'])
+    
+    def interpolate(self, vb, vr, vT, vs):
+        '''
+        Interpolated normalized critical prices, NaN outside the grid or
+        next to a node without a finite boundary; inf and 0 where the call and
+        the put are never exercised early.
+        '''
+        [vb, vr, vT, vs]= Broadcast_Params(vb, vr, vT, vs)
+        mPoints= np.stack([vb.ravel(), vr.ravel(), np.sqrt(vT.ravel()), vs.ravel()],
+                          axis=-1)
+        
+        vCrit_Call= np.exp(self._oCall(mPoints)).reshape(vb.shape)
+        vCrit_Put=  np.exp(self._oPut(mPoints)).reshape(vb.shape)
+        [vNo_Call, vNo_Put]=  No_Early_Exercise(vb, vr)
+        vCrit_Call[vNo_Call]= np.inf
+        vCrit_Put[vNo_Put]=   0.0
+        
+        return [vCrit_Call, vCrit_Put]
+    
+    def critical_prices(self, vb, vr, vT, vs, vX):
+        '''
+        Same as Critical_Prices, interpolated on the grid and solved exactly
+        elsewhere.
+        '''
+        [vb, vr, vT, vs, vX]=    Broadcast_Params(vb, vr, vT, vs, vX)
+        [vCrit_Call, vCrit_Put]= self.interpolate(vb, vr, vT, vs)
+        
+        vMiss= np.isnan(vCrit_Call) | np.isnan(vCrit_Put)
+        if vMiss.any():
+            [vCrit_Call[vMiss], vCrit_Put[vMiss]]= Critical_Prices(vb[vMiss], vr[vMiss],
+                                                                  vT[vMiss], vs[vMiss], 1.0)
+        
+        return [(vCrit_Call*vX)[()], (vCrit_Put*vX)[()]]
+
+###########################################################
+### [vEU_Put, vAme_Put, vPremium]= American_Put_Grid(vS, lq, dCrit_Put, vX, db, ds, dT, dr)
+def American_Put_Grid(vS, lq, dCrit_Put, vX, db, ds, dT, dr):
+    '''
+    Computing the European and American Put option prices and the early
+    exercise premium for a whole grid of commodity prices (and optionally
+    strikes) in one pass. All inputs broadcast against each other.
+    
+    Where the put is never exercised early (see No_Early_Exercise, or a zero
+    dCrit_Put from the solver) it gets its European price.
+    '''
     [dq_1, dq_2]= lq
-    d_1=          (np.log(dCrit_Put/iX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
-    dA_1=         -(dCrit_Put/dq_1)*(1-np.exp((db-dr)*dT)*st.norm.cdf(-d_1))
+    vS=           np.asarray(vS, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_1=  (np.log(dCrit_Put/vX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
+        dA_1= np.where(~No_Early_Exercise(db, dr)[1] & (dCrit_Put > 0),
+                       -(dCrit_Put/dq_1)*(1-np.exp((db-dr)*dT)*Norm_CDF(-d_1)), 0.0)
     
     #eq (6)
-    d_1S=    (np.log(dS/iX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
+    d_1S=    (np.log(vS/vX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
     d_2S=    d_1S - ds*np.sqrt(dT)
-    dEU_Put= iX*np.exp(-dr*dT)*st.norm.cdf(-d_2S)\
-        - dS*np.exp((db-dr)*dT)*st.norm.cdf(-d_1S)
+    vEU_Put= vX*np.exp(-dr*dT)*Norm_CDF(-d_2S)\
+        - vS*np.exp((db-dr)*dT)*Norm_CDF(-d_1S)
+    
+    #eq(25), exercise region S <= S*
+    vExercise= vS <= dCrit_Put
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vPremium= np.where(dA_1 != 0, dA_1*(vS/dCrit_Put)**dq_1, 0.0)
+    vAme_Put=  np.where(vExercise, vX - vS, vEU_Put + vPremium)
+        
+    return [vEU_Put, vAme_Put, vAme_Put - vEU_Put]
+
+###########################################################
+### [vEU_Call, vAme_Call, vPremium]= American_Call_Grid(vS, lq, dCrit_Call, vX, db, ds, dT, dr)
+def American_Call_Grid(vS, lq, dCrit_Call, vX, db, ds, dT, dr):
+    '''
+    Computing the European and American Call option prices and the early
+    exercise premium for a whole grid of commodity prices (and optionally
+    strikes) in one pass. All inputs broadcast against each other.
     
-    #eq(25)
-    if dS > dCrit_Put:
-        dAme_Put= dEU_Put + dA_1*(dS/dCrit_Put)**dq_1
-    if dS <= dCrit_Put:
-        dAme_Put= iX - dS
+    Where the call is never exercised early (see No_Early_Exercise, or an
+    infinite dCrit_Call from the solver) it gets its European price.
+    '''
+    [dq_1, dq_2]= lq
+    vS=           np.asarray(vS, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_1=  (np.log(dCrit_Call/vX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
+        dA_2= np.where(~No_Early_Exercise(db, dr)[0] & np.isfinite(dCrit_Call),
+                       (dCrit_Call/dq_2)*(1-np.exp((db-dr)*dT)*Norm_CDF(d_1)), 0.0)
+    
+    #eq (5)
+    d_1S=     (np.log(vS/vX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
+    d_2S=     d_1S - ds*np.sqrt(dT)
+    vEU_Call= vS*np.exp((db-dr)*dT)*Norm_CDF(d_1S)\
+        - vX*np.exp(-dr*dT)*Norm_CDF(d_2S)
+    
+    #eq (20), exercise region S >= S*
+    vExercise= vS >= dCrit_Call
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vPremium= np.where(dA_2 != 0, dA_2*(vS/dCrit_Call)**dq_2, 0.0)
+    vAme_Call= np.where(vExercise, vS - vX, vEU_Call + vPremium)
+    
+    return [vEU_Call, vAme_Call, vAme_Call - vEU_Call]
+
+###########################################################
+### [vEU_Put, vAme_Put, vPremium]= American_Put_Symmetry_Grid(vS, dCrit_Put, vX, db, ds, dT, dr, sEngine)
+def American_Put_Symmetry_Grid(vS, dCrit_Put, vX, db, ds, dT, dr, sEngine='baw'):
+    '''
+    European and American Put option prices as in American_Put_Grid, priced
+    by the call formula through put-call symmetry,
+    P(S, X, T, r, b, s)= C(X, S, T, r-b, -b, s). The transformed call has the
+    critical price S*X/S*_put. sEngine 'jz' uses Ju_Zhong_Grid for the call.
+    '''
+    vS= np.asarray(vS, dtype=float)
+    lq= roots(-db, dr - db, dT, ds)
+    with np.errstate(divide='ignore'):
+        dCrit= vS*vX/dCrit_Put
+    if sEngine == 'jz':
+        return Ju_Zhong_Grid(vX, lq, dCrit, vS, -db, ds, dT, dr - db, 1)
+    
+    return American_Call_Grid(vX, lq, dCrit, vS, -db, ds, dT, dr - db)
+
+###########################################################
+### [vEU, vAme, vPremium]= Ju_Zhong_Grid(vS, lq, dCrit, vX, db, ds, dT, dr, iPhi)
+def Ju_Zhong_Grid(vS, lq, dCrit, vX, db, ds, dT, dr, iPhi):
+    '''
+    European and American call (iPhi= 1) or put (iPhi= -1) prices with the
+    correction of Ju and Zhong (1999) to the quadratic approximation, for a
+    grid of commodity prices as in American_Call_Grid / American_Put_Grid.
+    
+    The critical price is the one of the quadratic approximation. Outside
+    the exercise region V = V_E(S) + hA*(S/S*)**q/(1 - chi) with
+    hA = iPhi*(S* - X) - V_E(S*) and chi = b_JZ*log(S/S*)**2 + c_JZ*log(S/S*).
+    The correction expands in h = 1 - exp(-rT) and breaks down for r <= 0
+    (1 - chi can reach zero); there chi = 0, which is the quadratic
+    approximation itself. Options that are never exercised early (see
+    No_Early_Exercise, or a critical price of inf or 0) get their European
+    price.
+    '''
+    [dq_1, dq_2]= lq
+    dq=           dq_2 if iPhi == 1 else dq_1
+    vS=           np.asarray(vS, dtype=float)
+    vEarly=       ~No_Early_Exercise(db, dr)[0 if iPhi == 1 else 1]\
+        & np.isfinite(dCrit) & (np.asarray(dCrit) > 0)
+    
+    vEU=   European_Greeks(vS, vX, db, ds, dT, dr, iPhi)[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lCrit= European_Greeks(dCrit, vX, db, ds, dT, dr, iPhi)
+        dhA=   iPhi*(dCrit - vX) - lCrit[0]
+    
+    #alpha/h with its limit 2/(s^2 T) for r= 0, 2*lambda + beta - 1, and
+    #alpha*lambda'(h); written so that every term stays finite for r= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dalpha_h= np.where(dr == 0, 2/(ds**2*dT), -2*dr/(ds**2*np.expm1(-dr*dT)))
+    dD=        2*dq + 2*db/ds**2 - 1
+    dalpha_dl= -dalpha_h**2/dD
+    
+    #dV_E(S*)/dh = dV_E(S*)/dT * exp(rT)/r, and alpha/r = 2/s^2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dJZ_b= np.exp(-dr*dT)*dalpha_dl/(2*dD)
+        dJZ_c= -(2/ds**2*lCrit[4]/dhA + np.exp(-dr*dT)*(dalpha_h + dalpha_dl/dD))/dD
         
-    return [dEU_Put, dAme_Put]
+        vLog=     np.log(vS/dCrit)
+        vChi=     np.where(np.asarray(dr) > 0, dJZ_b*vLog**2 + dJZ_c*vLog, 0.0)
+        vPremium= dhA*(vS/dCrit)**dq/(1 - vChi)
+    
+    vExercise= iPhi*(vS - dCrit) >= 0
+    vAme=      np.where(vExercise, iPhi*(vS - vX),
+                        np.where(vEarly, vEU + vPremium, vEU))
+    
+    return [vEU, vAme, vAme - vEU]
+
+###########################################################
+### dAme_Put= American_Put(dS, lq, dCrit_Put, iX, db, ds, dT, dr)
+def American_Put(dS, lq, dCrit_Put, iX, db, ds, dT, dr):
+    '''
+    Computing the American Put option price.
+    '''
+    [vEU_Put, vAme_Put, vPremium]= American_Put_Grid(dS, lq, dCrit_Put, iX,
+                                                     db, ds, dT, dr)
+        
+    return [vEU_Put[()], vAme_Put[()]]
 
 ###########################################################
 ### dAme_Call= American_Call(dS, lq, dCrit_Call, iX, db, ds, dT, dr)
@@ -157,66 +1019,1097 @@ def American_Call(dS, lq, dCrit_Call, iX, db, ds, dT, dr):
     '''
     Computing the American Call option price.
     '''
+    [vEU_Call, vAme_Call, vPremium]= American_Call_Grid(dS, lq, dCrit_Call, iX,
+                                                        db, ds, dT, dr)
+    
+    return [dS, vEU_Call[()], vAme_Call[()]]
+
+###########################################################
+### oContext= Model_Context(vT, vr, vs, db, iX, oCache)
+class Model_Context(object):
+    '''
+    Everything American_Call_Grid and American_Put_Grid compute that does not
+    depend on the commodity price, built once per parameter set: discount
+    factors, the drift term of d_1, the roots, the critical prices and the
+    coefficients A_2 and A_1 of eq (20)/(25).
     
+    T, r, sigma, b and X may be scalars or arrays and broadcast against each
+    other; the commodity prices passed to call(), put() and price() broadcast
+    against them (use vT[:, None] etc. for a parameter x price grid). A
+    reprice then costs one log, two CDFs and one exponential per side;
+    price() takes the European put from the call by put-call parity.
+    '''
+    __slots__= ('vT', 'vr', 'vs', 'vb', 'vX', 'vq_1', 'vq_2', 'vCrit_Call',
+                'vCrit_Put', 'vCarry_Disc', 'vX_Disc', 'vVol', 'vD_Offset',
+                'vLog_Crit_Call', 'vLog_Crit_Put', 'vA_1', 'vA_2')
+    
+    def __init__(self, vT, vr, vs, db, iX, oCache=None):
+        [vT, vr, vs, vb, vX]= Broadcast_Params(vT, vr, vs, db, iX)
+        if oCache is None:
+            [vCrit_Call, vCrit_Put]= Critical_Prices(vb, vr, vT, vs, vX)
+        else:
+            [vCrit_Call, vCrit_Put]= oCache.critical_prices(vb, vr, vT, vs, vX)
+    
+        [self.vT, self.vr, self.vs, self.vb, self.vX]= [vT, vr, vs, vb, vX]
+        [self.vq_1, self.vq_2]= roots(vb, vr, vT, vs)
+        self.vCrit_Call=  np.asarray(vCrit_Call, dtype=float)
+        self.vCrit_Put=   np.asarray(vCrit_Put, dtype=float)
+        self.vCarry_Disc= np.exp((vb-vr)*vT)
+        self.vX_Disc=     vX*np.exp(-vr*vT)
+        self.vVol=        vs*np.sqrt(vT)
+        #d_1(S)= log(S)/vVol + vD_Offset
+        self.vD_Offset=   ((vb + 0.5*vs**2)*vT - np.log(vX))/self.vVol
+    
+        #A_2 and A_1 of eq (20)/(25); the premium is A*exp(q*(log(S) - log(S*))),
+        #with A= 0 where the option is never exercised early
+        [vNo_Call, vNo_Put]= No_Early_Exercise(vb, vr)
+        vEarly_Call=         ~vNo_Call & np.isfinite(self.vCrit_Call)
+        vEarly_Put=          ~vNo_Put & (self.vCrit_Put > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.vLog_Crit_Call= np.log(self.vCrit_Call)
+            self.vLog_Crit_Put=  np.log(self.vCrit_Put)
+            d_1_Call= self.vLog_Crit_Call/self.vVol + self.vD_Offset
+            d_1_Put=  self.vLog_Crit_Put/self.vVol + self.vD_Offset
+            self.vA_2= np.where(vEarly_Call, (self.vCrit_Call/self.vq_2)
+                                *(1 - self.vCarry_Disc*Norm_CDF(d_1_Call)), 0.0)
+            self.vA_1= np.where(vEarly_Put, -(self.vCrit_Put/self.vq_1)
+                                *(1 - self.vCarry_Disc*Norm_CDF(-d_1_Put)), 0.0)
+    
+    def call(self, vS):
+        '''
+        European and American call prices at the commodity prices vS.
+        '''
+        vS=   np.asarray(vS, dtype=float)
+        vLog= np.log(vS)
+        d_1S= vLog/self.vVol + self.vD_Offset
+        vEU_Call=  vS*self.vCarry_Disc*Norm_CDF(d_1S) - self.vX_Disc*Norm_CDF(d_1S - self.vVol)
+        vAme_Call= np.where(vS >= self.vCrit_Call, vS - self.vX,
+                            vEU_Call + self.vA_2*np.exp(self.vq_2*(vLog - self.vLog_Crit_Call)))
+    
+        return [vEU_Call[()], vAme_Call[()]]
+    
+    def put(self, vS):
+        '''
+        European and American put prices at the commodity prices vS.
+        '''
+        vS=   np.asarray(vS, dtype=float)
+        vLog= np.log(vS)
+        d_1S= vLog/self.vVol + self.vD_Offset
+        vEU_Put=  self.vX_Disc*Norm_CDF(self.vVol - d_1S) - vS*self.vCarry_Disc*Norm_CDF(-d_1S)
+        vAme_Put= np.where(vS <= self.vCrit_Put, self.vX - vS,
+                           vEU_Put + self.vA_1*np.exp(self.vq_1*(vLog - self.vLog_Crit_Put)))
+    
+        return [vEU_Put[()], vAme_Put[()]]
+    
+    def price(self, vS):
+        '''
+        European and American call and put prices at the commodity prices vS,
+        sharing the log and the two CDFs between the sides.
+        '''
+        vS=   np.asarray(vS, dtype=float)
+        vLog= np.log(vS)
+        d_1S= vLog/self.vVol + self.vD_Offset
+        vS_Disc=   vS*self.vCarry_Disc
+        vEU_Call=  vS_Disc*Norm_CDF(d_1S) - self.vX_Disc*Norm_CDF(d_1S - self.vVol)
+        vEU_Put=   vEU_Call - vS_Disc + self.vX_Disc
+        vAme_Call= np.where(vS >= self.vCrit_Call, vS - self.vX,
+                            vEU_Call + self.vA_2*np.exp(self.vq_2*(vLog - self.vLog_Crit_Call)))
+        vAme_Put=  np.where(vS <= self.vCrit_Put, self.vX - vS,
+                            vEU_Put + self.vA_1*np.exp(self.vq_1*(vLog - self.vLog_Crit_Put)))
+    
+        return [vEU_Call[()], vAme_Call[()], vEU_Put[()], vAme_Put[()]]
+
+###########################################################
+### [vdq_ds, vdq_dT, vdq_dr, vdq_db]= Roots_Derivatives(lq, db, dr, dT, ds, iPhi)
+def Roots_Derivatives(lq, db, dr, dT, ds, iPhi):
+    '''
+    Derivatives of the roots of equation (13) with respect to sigma, T, r and
+    b, for q_2 (iPhi= 1) or q_1 (iPhi= -1).
+    '''
     [dq_1, dq_2]= lq
-    d_1=          (np.log(dCrit_Call/iX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
-    dA_2=         (dCrit_Call/dq_2)*(1-np.exp((db-dr)*dT)*st.norm.cdf(d_1))
+    dN= 2*db/ds**2
+    dK= -np.expm1(-dr*dT)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dM_K= np.where(dr == 0, 2/(ds**2*dT), 2*dr/ds**2/dK)
+        #d(M/K)/dr and d(M/K)/dT, with their limits for r= 0
+        dM_K_dr= np.where(dr == 0, 1/ds**2,
+                          2/ds**2*(dK - dr*dT*np.exp(-dr*dT))/dK**2)
+        dM_K_dT= np.where(dr == 0, -2/(ds**2*dT**2),
+                          -2*dr**2/ds**2*np.exp(-dr*dT)/dK**2)
+    
+    #q = (-(N-1) + iPhi*D)/2 with D**2 = (N-1)**2 + 4M/K
+    dD= iPhi*(2*(dq_2 if iPhi == 1 else dq_1) + dN - 1)
+    
+    def dq(dN_dx, dM_K_dx):
+        return (-dN_dx + iPhi*((dN - 1)*dN_dx + 2*dM_K_dx)/dD)/2
+    
+    vdq_ds= dq(-2*dN/ds, -2*dM_K/ds)
+    vdq_dT= dq(0, dM_K_dT)
+    vdq_dr= dq(0, dM_K_dr)
+    vdq_db= dq(2/ds**2, 0)
+    
+    return [vdq_ds, vdq_dT, vdq_dr, vdq_db]
+
+###########################################################
+### [vEU, vDelta, vGamma, vVega, vdV_dT, vRho, vCarry]= European_Greeks(vS, vX, db, ds, dT, dr, iPhi)
+def European_Greeks(vS, vX, db, ds, dT, dr, iPhi):
+    '''
+    European call (iPhi= 1) or put (iPhi= -1) price of eq (5)/(6) and its
+    sensitivities to S (delta, gamma), sigma, T, r (at fixed b) and b.
+    '''
+    vS=    np.asarray(vS, dtype=float)
+    dSqrt= np.sqrt(dT)
+    d_1=   (np.log(vS/vX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+    d_2=   d_1 - ds*dSqrt
+    dCarry_Disc= np.exp((db-dr)*dT)
+    dDisc=       np.exp(-dr*dT)
+    
+    vN_1= Norm_CDF(iPhi*d_1)
+    vN_2= Norm_CDF(iPhi*d_2)
+    vn_1= Norm_PDF(d_1)
+    
+    vEU=    iPhi*(vS*dCarry_Disc*vN_1 - vX*dDisc*vN_2)
+    vDelta= iPhi*dCarry_Disc*vN_1
+    vGamma= dCarry_Disc*vn_1/(vS*ds*dSqrt)
+    vVega=  vS*dCarry_Disc*vn_1*dSqrt
+    vdV_dT= vS*dCarry_Disc*vn_1*ds/(2*dSqrt)\
+        + iPhi*((db-dr)*vS*dCarry_Disc*vN_1 + dr*vX*dDisc*vN_2)
+    vRho=   -dT*vEU
+    vCarry= iPhi*dT*vS*dCarry_Disc*vN_1
+    
+    return [vEU, vDelta, vGamma, vVega, vdV_dT, vRho, vCarry]
+
+###########################################################
+### [vAme, vDelta, vGamma, vVega, vTheta, vRho, vCarry]= American_Greeks(vS, lq, dCrit, vX, db, ds, dT, dr, iPhi)
+def American_Greeks(vS, lq, dCrit, vX, db, ds, dT, dr, iPhi):
+    '''
+    American call (iPhi= 1) or put (iPhi= -1) price with its analytic
+    delta, gamma, vega, theta, rho and carry sensitivity, in one pass.
+    
+    Outside the exercise region V = V_E(S) + A*(S/S*)**q with
+    A = iPhi*(S* - X) - V_E(S*). The critical price satisfies the high
+    contact condition, so dV/dS* = 0 and the parameter sensitivities follow
+    from the explicit dependence of V_E and q alone. In the exercise region
+    V = iPhi*(S - X), whose only sensitivity is delta. Options that are never
+    exercised early (see No_Early_Exercise, or a critical price of inf or 0)
+    get the European values.
+    '''
+    [dq_1, dq_2]= lq
+    dq=           dq_2 if iPhi == 1 else dq_1
+    vS=           np.asarray(vS, dtype=float)
+    vEarly=       ~No_Early_Exercise(db, dr)[0 if iPhi == 1 else 1]\
+        & np.isfinite(dCrit) & (np.asarray(dCrit) > 0)
+    
+    lEU=   European_Greeks(vS, vX, db, ds, dT, dr, iPhi)
+    [vdq_ds, vdq_dT, vdq_dr, vdq_db]= Roots_Derivatives(lq, db, dr, dT, ds, iPhi)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lCrit=  European_Greeks(dCrit, vX, db, ds, dT, dr, iPhi)
+        
+        #eq (20)/(25): A_2 and A_1
+        d_1=    (np.log(dCrit/vX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
+        dA=     iPhi*(dCrit/dq)*(1-np.exp((db-dr)*dT)*Norm_CDF(iPhi*d_1))
+        vRatio= (vS/dCrit)**dq
+        vLog=   np.log(vS/dCrit)
+        
+        vAme=   lEU[0] + dA*vRatio
+        vDelta= lEU[1] + dA*dq*vRatio/vS
+        vGamma= lEU[2] + dA*dq*(dq - 1)*vRatio/vS**2
+        vVega=  lEU[3] - lCrit[3]*vRatio + dA*vRatio*vLog*vdq_ds
+        vdV_dT= lEU[4] - lCrit[4]*vRatio + dA*vRatio*vLog*vdq_dT
+        vRho=   lEU[5] - lCrit[5]*vRatio + dA*vRatio*vLog*vdq_dr
+        vCarry= lEU[6] - lCrit[6]*vRatio + dA*vRatio*vLog*vdq_db
+    
+    lAme= [np.where(vEarly, x, y) for (x, y) in
+           zip((vAme, vDelta, vGamma, vVega, vdV_dT, vRho, vCarry), lEU)]
+    
+    vExercise= iPhi*(vS - dCrit) >= 0
+    vZero=     np.zeros(vExercise.shape)
+    
+    return [np.where(vExercise, iPhi*(vS - vX), lAme[0]),
+            np.where(vExercise, float(iPhi), lAme[1]),
+            np.where(vExercise, vZero, lAme[2]),
+            np.where(vExercise, vZero, lAme[3]),
+            np.where(vExercise, vZero, -lAme[4]),
+            np.where(vExercise, vZero, lAme[5]),
+            np.where(vExercise, vZero, lAme[6])]
+
+###########################################################
+### [vAme_Call, vDelta, vGamma, vVega, vTheta, vRho, vCarry]= American_Call_Greeks(vS, lq, dCrit_Call, vX, db, ds, dT, dr)
+def American_Call_Greeks(vS, lq, dCrit_Call, vX, db, ds, dT, dr):
+    '''
+    American Call option price and analytic Greeks over a grid of commodity
+    prices (and optionally strikes).
+    '''
+    return American_Greeks(vS, lq, dCrit_Call, vX, db, ds, dT, dr, 1)
+
+###########################################################
+### [vAme_Put, vDelta, vGamma, vVega, vTheta, vRho, vCarry]= American_Put_Greeks(vS, lq, dCrit_Put, vX, db, ds, dT, dr)
+def American_Put_Greeks(vS, lq, dCrit_Put, vX, db, ds, dT, dr):
+    '''
+    American Put option price and analytic Greeks over a grid of commodity
+    prices (and optionally strikes).
+    '''
+    return American_Greeks(vS, lq, dCrit_Put, vX, db, ds, dT, dr, -1)
+
+###########################################################
+### Gauss-Legendre nodes
+#Nodes on (-1, 0) and weights of the 6, 12 and 20 point rules used by
+#Bivariate_Norm_CDF for |rho| below 0.3, 0.75 and 0.925 (and above)
+lGauss_Legendre= [(dHigh,) + tuple(x[:iPoints//2] for x in np.polynomial.legendre.leggauss(iPoints))
+                  for (dHigh, iPoints) in ((0.3, 6), (0.75, 12), (0.925, 20))]
+
+###########################################################
+### vM= Bivariate_Norm_CDF(vx, vy, vrho)
+def Bivariate_Norm_CDF(vx, vy, vrho):
+    '''
+    Standard bivariate normal cumulative distribution M(x, y; rho), by the
+    Drezner and Wesolowsky (1990) quadrature as refined by Genz (2004). All
+    inputs broadcast against each other; a scalar rho is cheapest.
+    '''
+    [vh, vk, vr]= Broadcast_Params(vx, vy, vrho)
+    vShape=       vh.shape
+    [vh, vk, vr]= [-vh.ravel(), -vk.ravel(), vr.ravel()]
+    vAbs=         np.abs(vr)
+    vM=           np.empty(vh.shape)
+    
+    #Small |rho|: integrate over asin(rho)
+    dLow= 0
+    for (dHigh, vx_GL, vw_GL) in lGauss_Legendre:
+        vIdx=   np.nonzero((vAbs >= dLow) & (vAbs < dHigh))[0]
+        dLow=   dHigh
+        if len(vIdx) == 0:
+            continue
+        [h, k]= [vh[vIdx], vk[vIdx]]
+        asr=    np.arcsin(vrho if np.ndim(vrho) == 0 else vr[vIdx, None])
+        sn=     np.sin(asr*np.concatenate((vx_GL + 1, 1 - vx_GL))/2)
+        w=      np.concatenate((vw_GL, vw_GL))
+        d=      1/(1 - sn**2)
+        bvn=    np.exp((h*k)[:, None]*(sn*d) - ((h**2 + k**2)/2)[:, None]*d)
+        bvn=    bvn @ w if np.ndim(vrho) == 0 else (bvn*w).sum(axis=1)
+        vM[vIdx]= bvn*np.ravel(asr)/(4*np.pi) + Norm_CDF(-h)*Norm_CDF(-k)
+    
+    #Large |rho|: integrate the difference to the perfectly correlated case
+    vIdx= np.nonzero(vAbs >= dLow)[0]
+    if len(vIdx) == 0:
+        return vM.reshape(vShape)[()]
+    [vx_GL, vw_GL]= lGauss_Legendre[-1][1:]
+    r=    vr[vIdx, None]
+    h=    vh[vIdx, None]
+    k=    np.where(r < 0, -vk[vIdx, None], vk[vIdx, None])
+    hk=   h*k
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        a_s= (1 - r)*(1 + r)
+        a=   np.sqrt(a_s)
+        bs=  (h - k)**2
+        c=   (4 - hk)/8
+        d=   (12 - hk)/16
+        bvn= a*np.exp(-(bs/a_s + hk)/2)*(1 - c*(bs - a_s)*(1 - d*bs/5)/3 + c*d*a_s**2/5)
+        b=   np.sqrt(bs)
+        bvn= bvn - np.where(hk > -160, np.exp(-hk/2)*np.sqrt(2*np.pi)*Norm_CDF(-b/a)*b
+                            *(1 - c*bs*(1 - d*bs/5)/3), 0)
+        a=   a/2
+        xs=  (a*(vx_GL + 1))**2
+        rs=  np.sqrt(1 - xs)
+        bvn= bvn + (a*vw_GL*(np.exp(-bs/(2*xs) - hk/(1 + rs))/rs
+                             - np.exp(-(bs/xs + hk)/2)*(1 + c*xs*(1 + d*xs)))).sum(axis=1, keepdims=True)
+        xs=  a_s*(1 - vx_GL)**2/4
+        rs=  np.sqrt(1 - xs)
+        bvn= bvn + (a*vw_GL*np.exp(-(bs/xs + hk)/2)
+                    *(np.exp(-hk*(1 - rs)/(2*(1 + rs)))/rs
+                      - (1 + c*xs*(1 + d*xs)))).sum(axis=1, keepdims=True)
+        bvn= np.where(np.abs(r) < 1, -bvn/(2*np.pi), 0)
+    
+    [r, h, k, bvn]= [r[:, 0], h[:, 0], k[:, 0], bvn[:, 0]]
+    vM[vIdx]=       np.where(r > 0, bvn + Norm_CDF(-np.maximum(h, k)),
+                             -bvn + np.maximum(0, Norm_CDF(-h) - Norm_CDF(-k)))
+    
+    return np.clip(vM, 0, 1).reshape(vShape)[()]
+
+###########################################################
+### vphi= BS2002_Phi(vS, vT, vgamma, vH, vI, vr, vb, vs)
+def BS2002_Phi(vS, vT, vgamma, vH, vI, vr, vb, vs):
+    '''
+    The phi function of Bjerksund and Stensland (2002): value of receiving
+    S**gamma at T, knocked out when S reaches the flat barrier I.
+    '''
+    dsT=     vs*np.sqrt(vT)
+    dlambda= (-vr + vgamma*vb + 0.5*vgamma*(vgamma - 1)*vs**2)*vT
+    dkappa=  2*vb/vs**2 + 2*vgamma - 1
+    d=       -(np.log(vS/vH) + (vb + (vgamma - 0.5)*vs**2)*vT)/dsT
+    
+    return np.exp(dlambda)*vS**vgamma*(Norm_CDF(d)
+                                       - (vI/vS)**dkappa*Norm_CDF(d - 2*np.log(vI/vS)/dsT))
+
+###########################################################
+### vpsi= BS2002_Psi(vS, vT, vgamma, vH, vI_2, vI_1, vt_1, vr, vb, vs)
+def BS2002_Psi(vS, vT, vgamma, vH, vI_2, vI_1, vt_1, vr, vb, vs):
+    '''
+    The psi function of Bjerksund and Stensland (2002): as phi, with the
+    barrier I_1 up to t_1 and I_2 from t_1 to T.
+    '''
+    dDrift=   vb + (vgamma - 0.5)*vs**2
+    [dst_1, dsT]= [vs*np.sqrt(vt_1), vs*np.sqrt(vT)]
+    drho=     np.sqrt(vt_1/vT)
+    if np.size(drho) and np.all(np.abs(drho - np.ravel(drho)[0]) < 1e-12):
+        drho= np.ravel(drho)[0]             #one correlation, cheaper in Bivariate_Norm_CDF
+    dlambda=  -vr + vgamma*vb + 0.5*vgamma*(vgamma - 1)*vs**2
+    dkappa=   2*vb/vs**2 + 2*vgamma - 1
+    
+    e_1= (np.log(vS/vI_1) + dDrift*vt_1)/dst_1
+    e_2= (np.log(vI_2**2/(vS*vI_1)) + dDrift*vt_1)/dst_1
+    e_3= (np.log(vS/vI_1) - dDrift*vt_1)/dst_1
+    e_4= (np.log(vI_2**2/(vS*vI_1)) - dDrift*vt_1)/dst_1
+    f_1= (np.log(vS/vH) + dDrift*vT)/dsT
+    f_2= (np.log(vI_2**2/(vS*vH)) + dDrift*vT)/dsT
+    f_3= (np.log(vI_1**2/(vS*vH)) + dDrift*vT)/dsT
+    f_4= (np.log(vS*vI_1**2/(vH*vI_2**2)) + dDrift*vT)/dsT
+    
+    return np.exp(dlambda*vT)*vS**vgamma*(
+        Bivariate_Norm_CDF(-e_1, -f_1, drho)
+        - (vI_2/vS)**dkappa*Bivariate_Norm_CDF(-e_2, -f_2, drho)
+        - (vI_1/vS)**dkappa*Bivariate_Norm_CDF(-e_3, -f_3, -drho)
+        + (vI_1/vI_2)**dkappa*Bivariate_Norm_CDF(-e_4, -f_4, -drho))
+
+###########################################################
+### [vEU_Call, vAme_Call]= BS2002_Call(vS, vX, vT, vr, vb, vs)
+def BS2002_Call(vS, vX, vT, vr, vb, vs):
+    '''
+    European and American Call option prices by the two-step flat boundary
+    approximation of Bjerksund and Stensland (2002): closed form, with no
+    iterative procedure. All inputs broadcast against each other.
+    
+    Rows where the call is never exercised early (b >= max(r, 0), see
+    No_Early_Exercise) get the European price. With r < b < 0 the exercise
+    region is bounded on both sides (X < S < r/(r-b)*X close to expiry) and
+    no flat boundary exists; these rows get the lower bound
+    max(European, S - X).
+    '''
+    [vS, vX, vT, vr, vb, vs]= Broadcast_Params(vS, vX, vT, vr, vb, vs)
     
     #eq (5)
-    d_1S=     (np.log(dS/iX) + (db + 0.5*ds**2)*dT)/(ds*np.sqrt(dT))
-    d_2S=     d_1S - ds*np.sqrt(dT)
-    dEU_Call= dS*np.exp((db-dr)*dT)*st.norm.cdf(d_1S)\
-        - iX*np.exp(-dr*dT)*st.norm.cdf(d_2S)
+    d_1S=      (np.log(vS/vX) + (vb + 0.5*vs**2)*vT)/(vs*np.sqrt(vT))
+    d_2S=      d_1S - vs*np.sqrt(vT)
+    vEU_Call=  vS*np.exp((vb-vr)*vT)*Norm_CDF(d_1S) - vX*np.exp(-vr*vT)*Norm_CDF(d_2S)
+    vTwo_Sided= (vr < vb) & (vb < 0)
+    vAme_Call=  np.where(vTwo_Sided, np.maximum(vEU_Call, vS - vX), vEU_Call).ravel()
     
-    #eq (20)
-    if dS < dCrit_Call:
-        dAme_Call= dEU_Call + dA_2*(dS/dCrit_Call)**dq_2
-    if dS > dCrit_Call:
-        dAme_Call= dS - iX
+    vIdx= np.flatnonzero(~No_Early_Exercise(vb, vr)[0] & ~vTwo_Sided)
+    [S, X, T, r, b, s]= [x.ravel()[vIdx] for x in (vS, vX, vT, vr, vb, vs)]
     
-    return [dS, dEU_Call, dAme_Call]
+    #Boundaries I_1 (up to t_1) and I_2 (from t_1 to T),
+    #I= B_0 + (B_inf - B_0)*(1 - exp(h)) with h= -k/(B_inf - B_0); for b= r < 0
+    #beta= 1 and B_inf is infinite, where I tends to B_0 + k
+    t_1=      0.5*(np.sqrt(5) - 1)*T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dbeta=    (0.5 - b/s**2) + np.sqrt((b/s**2 - 0.5)**2 + 2*r/s**2)
+        dB_inf=   dbeta/(dbeta - 1)*X
+        dB_0=     np.maximum(X, r/(r - b)*X)
+        dGap=     dB_inf - dB_0
+        k_1=      (b*t_1 + 2*s*np.sqrt(t_1))*X**2/dB_0
+        k_2=      (b*T + 2*s*np.sqrt(T))*X**2/dB_0
+        I_1=      dB_0 + np.where(np.isinf(dGap), k_1, -dGap*np.expm1(-k_1/dGap))
+        I_2=      dB_0 + np.where(np.isinf(dGap), k_2, -dGap*np.expm1(-k_2/dGap))
+    dalpha_1= (I_1 - X)*I_1**(-dbeta)
+    dalpha_2= (I_2 - X)*I_2**(-dbeta)
+    
+    #Below the boundary; beyond I_2 the option is exercised at once
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        lArgs= [r, b, s]
+        dAme= dalpha_2*S**dbeta\
+            - dalpha_2*BS2002_Phi(S, t_1, dbeta, I_2, I_2, *lArgs)\
+            + BS2002_Phi(S, t_1, 1, I_2, I_2, *lArgs)\
+            - BS2002_Phi(S, t_1, 1, I_1, I_2, *lArgs)\
+            - X*BS2002_Phi(S, t_1, 0, I_2, I_2, *lArgs)\
+            + X*BS2002_Phi(S, t_1, 0, I_1, I_2, *lArgs)\
+            + dalpha_1*BS2002_Phi(S, t_1, dbeta, I_1, I_2, *lArgs)\
+            - dalpha_1*BS2002_Psi(S, T, dbeta, I_1, I_2, I_1, t_1, *lArgs)\
+            + BS2002_Psi(S, T, 1, I_1, I_2, I_1, t_1, *lArgs)\
+            - BS2002_Psi(S, T, 1, X, I_2, I_1, t_1, *lArgs)\
+            - X*BS2002_Psi(S, T, 0, I_1, I_2, I_1, t_1, *lArgs)\
+            + X*BS2002_Psi(S, T, 0, X, I_2, I_1, t_1, *lArgs)
+    
+    vAme_Call[vIdx]= np.where(S >= I_2, S - X, dAme)
+    
+    return [vEU_Call[()], vAme_Call.reshape(vEU_Call.shape)[()]]
 
 ###########################################################
-### lAme_Option_prices= Ame_Option_Price(vT, vr, vs, db, iX, vS)
-def Ame_Option_Price(vT, vr, vs, db, iX, vS):
-    ''' 
-    Get list of American Option prices throughout the quadratic
-    approximation method.
+### [vEU_Put, vAme_Put]= BS2002_Put(vS, vX, vT, vr, vb, vs)
+def BS2002_Put(vS, vX, vT, vr, vb, vs):
+    '''
+    European and American Put option prices of Bjerksund and Stensland (2002),
+    through the put-call transformation P(S, X, T, r, b, s)= C(X, S, T, r-b,
+    -b, s).
+    '''
+    [vS, vX, vT, vr, vb, vs]= Broadcast_Params(vS, vX, vT, vr, vb, vs)
+    
+    return BS2002_Call(vX, vS, vT, vr - vb, -vb, vs)
+
+###########################################################
+### vV= Lattice_Induction(vS, vX, vT, vr, vb, vs, vPhi, iSteps, sMethod, bAmerican)
+def Lattice_Induction(vS, vX, vT, vr, vb, vs, vPhi, iSteps, sMethod, bAmerican):
+    '''
+    Backward induction through iSteps binomial steps for 1-d arrays of
+    options (vPhi= 1 call, -1 put), all stepped together with one option per
+    row of the lattice.
+    '''
+    [S, X, T, r, b, s, phi]= [x[:, None] for x in (vS, vX, vT, vr, vb, vs, vPhi)]
+    dt=   T/iSteps
+    dGrowth= np.exp(b*dt)
+    if sMethod == 'crr':
+        u= np.exp(s*np.sqrt(dt))
+        d= 1/u
+        p= (dGrowth - d)/(u - d)
+    else:
+        #Peizer-Pratt method 2 inversion of d_1 and d_2
+        d_1= (np.log(S/X) + (b + 0.5*s**2)*T)/(s*np.sqrt(T))
+        d_2= d_1 - s*np.sqrt(T)
+        fInv= lambda z: 0.5 + np.sign(z)*0.5*np.sqrt(
+            1 - np.exp(-(z/(iSteps + 1/3 + 0.1/(iSteps + 1)))**2*(iSteps + 1/6)))
+        p=   fInv(d_2)
+        u=   dGrowth*fInv(d_1)/p
+        d=   (dGrowth - p*u)/(1 - p)
+    dDisc=  np.exp(-r*dt)
+    [pu, pd]= [dDisc*p, dDisc*(1 - p)]
+    
+    #Powers of u and d; node j of step i is S*u**(i-j)*d**j
+    vk=     np.arange(iSteps + 1)
+    mU=     S*u**vk
+    mD=     d**vk
+    V=      np.maximum(phi*(mU[:, ::-1]*mD - X), 0)
+    for i in range(iSteps - 1, -1, -1):
+        V= pu*V[:, :-1] + pd*V[:, 1:]
+        if bAmerican:
+            V= np.maximum(V, phi*(mU[:, i::-1]*mD[:, :i+1] - X))
+    
+    return V[:, 0]
+
+###########################################################
+### vV= Lattice_Price(vS, vX, vT, vr, vb, vs, vCall, iSteps, sMethod, bRichardson, bAmerican)
+def Lattice_Price(vS, vX, vT, vr, vb, vs, vCall, iSteps=1001, sMethod='lr',
+                  bRichardson=False, bAmerican=True):
+    '''
+    Reference American (bAmerican= False: European) option prices on a
+    binomial lattice with cost of carry b, to measure the error of the
+    approximations against. sMethod is 'crr' (Cox, Ross and Rubinstein, 1979)
+    or 'lr' (Leisen and Reimer, 1996, odd number of steps). All inputs
+    broadcast against each other; vCall selects calls (True) or puts.
+    
+    The options are stepped back together in blocks of rows that keep every
+    lattice array near 32 MB. bRichardson extrapolates the prices on iSteps
+    and about iSteps/2 steps with the error order of the method (1 for CRR,
+    2 for LR).
+    '''
+    if sMethod not in ('crr', 'lr'):
+        raise ValueError("sMethod must be 'crr' or 'lr', got %r" % sMethod)
+    if sMethod == 'lr':
+        iSteps+= 1 - iSteps % 2
+    
+    if bRichardson:
+        iHalf= iSteps//2
+        if sMethod == 'lr':
+            iHalf+= 1 - iHalf % 2
+        iOrder=  2 if sMethod == 'lr' else 1
+        [dW_N, dW_M]= [iSteps**iOrder, iHalf**iOrder]
+        lArgs=   [vS, vX, vT, vr, vb, vs, vCall]
+        return (dW_N*Lattice_Price(*lArgs, iSteps, sMethod, False, bAmerican)
+                - dW_M*Lattice_Price(*lArgs, iHalf, sMethod, False, bAmerican))/(dW_N - dW_M)
+    
+    [vS, vX, vT, vr, vb, vs, vCall]= Broadcast_Params(vS, vX, vT, vr, vb, vs, vCall)
+    vShape= vS.shape
+    lRows=  [x.ravel() for x in (vS, vX, vT, vr, vb, vs, np.where(vCall != 0, 1.0, -1.0))]
+    vV=     np.empty(vS.size)
+    iBlock= max(1, 2**22//(iSteps + 1))
+    for i in range(0, vS.size, iBlock):
+        vV[i:i+iBlock]= Lattice_Induction(*[x[i:i+iBlock] for x in lRows],
+                                          iSteps, sMethod, bAmerican)
+    
+    return vV.reshape(vShape)[()]
+
+###########################################################
+### [vT, vr, vs, vb, vX, mS]= Grid_Params(vT, vr, vs, vb, vX, vS)
+def Grid_Params(vT, vr, vs, vb, vX, vS):
+    '''
+    Parameter rows and commodity price grid of the array pricers. T, r,
+    sigma, b and X broadcast against each other to 1-d float64 arrays, one
+    element per row; vS is either one row of commodity prices shared by all
+    rows or a 2-d array with one row of prices per parameter row, and is
+    returned as the (n_params, n_spots) grid mS.
+    '''
+    vS=     np.atleast_1d(np.asarray(vS, dtype=float))
+    tShape= np.broadcast_shapes(*[np.shape(x) for x in (vT, vr, vs, vb, vX)], vS.shape[:-1])
+    [vT, vr, vs, vb, vX]= [np.atleast_1d(np.array(np.broadcast_to(x, tShape), dtype=float))
+                           for x in (vT, vr, vs, vb, vX)]
+    mS=     np.empty((len(vT), vS.shape[-1]))
+    mS[:]=  vS
+    
+    return [vT, vr, vs, vb, vX, mS]
+
+###########################################################
+### [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]= Ame_Option_Price_Array(vT, vr, vs, db, iX, vS, oCache, iWorkers, iChunk, bContinuation, sBackend, sEngine, sSide, bSymmetry)
+def Ame_Option_Price_Array(vT, vr, vs, db, iX, vS, oCache=None, iWorkers=1,
+                           iChunk=None, bContinuation=False, sBackend=None,
+                           sEngine='baw', sSide='both', bSymmetry=False):
+    '''
+    American and European option prices throughout the quadratic
+    approximation method, as float64 arrays of shape (n_params, n_spots):
+    one row per (T, r, sigma, b, X) set and one column per commodity price.
+    No rounding is applied.
+    
+    T, r, sigma, the cost of carry db and the strike iX are scalars or 1-d
+    arrays broadcast against each other, so a book on several commodities
+    and strikes is priced in one call. vS is one row of commodity prices
+    shared by all rows, or 2-d with one row of prices per parameter row
+    (e.g. vS[:, None] for one spot per row), see Grid_Params.
+    
+    Passing a Critical_Price_Cache (or a Boundary_Surface) as oCache reuses
+    critical prices solved in earlier calls. iWorkers other than 1 prices the
+    rows in a process pool, see Ame_Option_Price_Parallel. bContinuation
+    warm-starts the critical price solves across neighbouring maturities.
+    sBackend overrides the module backend; the numba kernels price the whole
+    grid when neither oCache nor bContinuation is used.
+    
+    sEngine= 'jz' adds the Ju and Zhong (1999) correction to the quadratic
+    approximation ('baw'), with the same critical prices. sEngine= 'bs2002'
+    prices the grid with the closed-form Bjerksund and Stensland (2002)
+    approximation, sEngine= 'lattice' with the reference Leisen-Reimer lattice
+    of Lattice_Price (1001 steps, Richardson extrapolation); the solver
+    options above do not apply to these two.
+    
+    sSide= 'call' or 'put' prices only that side: the critical price of the
+    other side is not solved (an oCache still stores both sides) and its two
+    outputs are None. bSymmetry= True solves and prices the puts with the
+    call machinery through put-call symmetry, see Critical_Prices_Symmetry
+    and American_Put_Symmetry_Grid; it cannot be combined with oCache,
+    bContinuation or the 'bs2002' and 'lattice' engines.
+    '''
+    if sEngine not in ('baw', 'jz', 'bs2002', 'lattice'):
+        raise ValueError("sEngine must be 'baw', 'jz', 'bs2002' or 'lattice', got %r"
+                         % sEngine)
+    if bSymmetry and sEngine in ('bs2002', 'lattice'):
+        raise ValueError("bSymmetry cannot be combined with sEngine %r" % sEngine)
+    [bCall, bPut]= Side_Flags(sSide)
+    
+    [vT, vr, vs, vb, vX, mS]= Grid_Params(vT, vr, vs, db, iX, vS)
+    [mEU_Call, mAme_Call, mEU_Put, mAme_Put]= [None]*4
+    if sEngine in ('bs2002', 'lattice'):
+        [mT, mr, ms, mb, mX]= [x[:, None] for x in (vT, vr, vs, vb, vX)]
+        if sEngine == 'bs2002':
+            if bCall:
+                [mEU_Call, mAme_Call]= BS2002_Call(mS, mX, mT, mr, mb, ms)
+            if bPut:
+                [mEU_Put, mAme_Put]=   BS2002_Put(mS, mX, mT, mr, mb, ms)
+        else:
+            #Calls and puts stepped back in one lattice
+            vCall= [[[True]], [[False]]] if sSide == 'both' else [[[bCall]]]
+            lAme=  list(Lattice_Price(mS, mX, mT, mr, mb, ms, vCall, bRichardson=True))
+            if bCall:
+                mAme_Call= lAme.pop(0)
+                mEU_Call=  European_Greeks(mS, mX, mb, ms, mT, mr, 1)[0]
+            if bPut:
+                mAme_Put=  lAme.pop(0)
+                mEU_Put=   European_Greeks(mS, mX, mb, ms, mT, mr, -1)[0]
+        return [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]
+    
+    if bSymmetry and oCache is not None:
+        raise ValueError('bSymmetry cannot be combined with oCache')
+    if iWorkers != 1:
+        if oCache is not None:
+            raise ValueError('oCache cannot be shared with worker processes')
+        return Ame_Option_Price_Parallel(vT, vr, vs, vb, vX, mS, iWorkers, iChunk,
+                                         sEngine, sSide, bSymmetry, bContinuation,
+                                         sBackend)
+    
+    oKernels= Numba_Kernels(sBackend)
+    if oKernels is not None and oCache is None and not bContinuation and not bSymmetry\
+            and sEngine == 'baw':
+        lPrices= oKernels.Ame_Option_Price_Array(vT, vr, vs, vb, vX, mS, 0.00001, 1000,
+                                                 bCall, bPut)
+        return [mS] + [x if bSide else None
+                       for (x, bSide) in zip(lPrices, (bCall, bCall, bPut, bPut))]
+    
+    [vq_1, vq_2]= roots(vb, vr, vT, vs)
+    if oCache is None:
+        [vCrit_Call, vCrit_Put]= Critical_Prices(vb, vr, vT, vs, vX, bContinuation,
+                                                 sSide=sSide, bSymmetry=bSymmetry)
+    else:
+        [vCrit_Call, vCrit_Put]= oCache.critical_prices(vb, vr, vT, vs, vX)
+    
+    #Parameters along the rows, commodity prices along the columns
+    [mT, mr, ms, mb, mX]= [x[:, None] for x in (vT, vr, vs, vb, vX)]
+    lq=                   [vq_1[:, None], vq_2[:, None]]
+    
+    if bPut and bSymmetry:
+        [mEU_Put, mAme_Put, _]= American_Put_Symmetry_Grid(mS, vCrit_Put[:, None], mX, mb,
+                                                           ms, mT, mr, sEngine)
+    
+    if sEngine == 'jz':
+        if bCall:
+            [mEU_Call, mAme_Call, _]= Ju_Zhong_Grid(mS, lq, vCrit_Call[:, None],
+                                                    mX, mb, ms, mT, mr, 1)
+        if bPut and not bSymmetry:
+            [mEU_Put, mAme_Put, _]=   Ju_Zhong_Grid(mS, lq, vCrit_Put[:, None],
+                                                    mX, mb, ms, mT, mr, -1)
+        return [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]
+    
+    if bCall:
+        [mEU_Call, mAme_Call, _]= American_Call_Grid(mS, lq, vCrit_Call[:, None],
+                                                     mX, mb, ms, mT, mr)
+    if bPut and not bSymmetry:
+        [mEU_Put, mAme_Put, _]=   American_Put_Grid(mS, lq, vCrit_Put[:, None],
+                                                    mX, mb, ms, mT, mr)
+    
+    return [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]
+
+###########################################################
+### [mError_Call, mError_Put]= Ame_Option_Price_Error(vT, vr, vs, db, iX, vS, sEngine, iSteps)
+def Ame_Option_Price_Error(vT, vr, vs, db, iX, vS, sEngine='baw', iSteps=1001):
+    '''
+    Error of the American call and put prices of sEngine against the
+    Leisen-Reimer lattice on iSteps steps with Richardson extrapolation, on
+    the (n_params, n_spots) grid of Ame_Option_Price_Array.
+    '''
+    [mS, _, mAme_Call, _, mAme_Put]= Ame_Option_Price_Array(vT, vr, vs, db, iX, vS,
+                                                            sEngine=sEngine)
+    [mT, mr, ms, mb, mX]= [x[:, None] for x in Grid_Params(vT, vr, vs, db, iX, vS)[:5]]
+    [mRef_Call, mRef_Put]= Lattice_Price(mS, mX, mT, mr, mb, ms, [[[True]], [[False]]],
+                                         iSteps, 'lr', True)
+    
+    return [mAme_Call - mRef_Call, mAme_Put - mRef_Put]
+
+###########################################################
+### [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]= Ame_Option_Price_Parallel(vT, vr, vs, db, iX, vS, iWorkers, iChunk, sEngine, sSide, bSymmetry, bContinuation, sBackend)
+def Ame_Option_Price_Parallel(vT, vr, vs, db, iX, vS, iWorkers=None, iChunk=None,
+                              sEngine='baw', sSide='both', bSymmetry=False,
+                              bContinuation=False, sBackend=None):
+    '''
+    Same as Ame_Option_Price_Array, with the parameter rows split in
+    chunks of iChunk rows that are priced in a pool of iWorkers processes
+    (default: all cores, about four chunks per worker). Workers return whole
+    arrays, which are copied into preallocated outputs in row order.
+    bContinuation and sBackend are applied by every worker to its chunk.
+    '''
+    [vT, vr, vs, vb, vX, mS]= Grid_Params(vT, vr, vs, db, iX, vS)
+    iRows= len(vT)
+    if iWorkers is None:
+        iWorkers= os.cpu_count() or 1
+    if iChunk is None:
+        iChunk= max(1, -(-iRows//(4*iWorkers)))
+    
+    lStart= list(range(0, iRows, iChunk))
+    if iWorkers == 1 or len(lStart) == 1:
+        return Ame_Option_Price_Array(vT, vr, vs, vb, vX, mS, None, 1, None, bContinuation,
+                                      sBackend, sEngine, sSide, bSymmetry)
+    
+    [bCall, bPut]= Side_Flags(sSide)
+    lOutput= [np.empty(mS.shape) if bSide else None
+              for bSide in (True, bCall, bCall, bPut, bPut)]
+    with ProcessPoolExecutor(max_workers=iWorkers) as oPool:
+        lChunks= oPool.map(Ame_Option_Price_Array,
+                           *[[x[i:i+iChunk] for i in lStart] for x in (vT, vr, vs, vb, vX, mS)],
+                           repeat(None), repeat(1), repeat(None), repeat(bContinuation),
+                           repeat(sBackend), repeat(sEngine), repeat(sSide),
+                           repeat(bSymmetry))
+        for (i, lChunk) in zip(lStart, lChunks):
+            for (mOut, mChunk) in zip(lOutput, lChunk):
+                if mOut is not None:
+                    mOut[i:i+iChunk]= mChunk
+    
+    return lOutput
+
+###########################################################
+### [mX, mEU_Call, mAme_Call, mEU_Put, mAme_Put]= Ame_Option_Chain_Price(vT, vr, vs, db, vX, vS, oCache)
+def Ame_Option_Chain_Price(vT, vr, vs, db, vX, vS, oCache=None):
+    '''
+    American and European option prices for whole strike chains, as float64
+    arrays of shape (n_params, n_strikes): one row per (T, r, sigma, b) set
+    and one column per strike. vS is the commodity price, either one value or
+    one per row.
+    
+    The model is homogeneous of degree one in (S, X), so the critical prices
+    are solved once per row for a unit strike and scaled to every strike.
+    '''
+    [vT, vr, vs, vb, vS]= [np.atleast_1d(x) for x in Broadcast_Params(vT, vr, vs, db, vS)]
+    vX=                   np.asarray(vX, dtype=float)
+    [vq_1, vq_2]= roots(vb, vr, vT, vs)
+    if oCache is None:
+        [vCrit_Call, vCrit_Put]= Critical_Prices(vb, vr, vT, vs, 1.0)
+    else:
+        [vCrit_Call, vCrit_Put]= oCache.critical_prices(vb, vr, vT, vs, 1.0)
+    
+    #Parameters along the rows, strikes along the columns
+    [mT, mr, ms, mb, mS]= [x[:, None] for x in (vT, vr, vs, vb, vS)]
+    lq=                   [vq_1[:, None], vq_2[:, None]]
+    mX=                   np.empty((len(vT), len(vX)))
+    mX[:]=                vX
+    
+    [mEU_Call, mAme_Call, _]= American_Call_Grid(mS, lq, vCrit_Call[:, None]*mX,
+                                                 mX, mb, ms, mT, mr)
+    [mEU_Put, mAme_Put, _]=   American_Put_Grid(mS, lq, vCrit_Put[:, None]*mX,
+                                                mX, mb, ms, mT, mr)
+    
+    return [mX, mEU_Call, mAme_Call, mEU_Put, mAme_Put]
+
+###########################################################
+### [lUnique, vGroup]= Group_Params(vx, vy, ...)
+def Group_Params(*args):
+    '''
+    Unique rows of the 1-d parameter arrays taken together (lUnique, one
+    array per parameter, in lexicographic order) and the index of the unique
+    row of every element (vGroup), such that x[i] == lUnique[k][vGroup[i]].
+    '''
+    mParams= np.column_stack(args)
+    vOrder=  np.lexsort(mParams.T[::-1])
+    mSorted= mParams[vOrder]
+    vNew=    np.ones(len(mSorted), dtype=bool)
+    vNew[1:]= np.any(mSorted[1:] != mSorted[:-1], axis=1)
+    
+    vGroup=         np.empty(len(mSorted), dtype=np.intp)
+    vGroup[vOrder]= np.cumsum(vNew) - 1
+    
+    return [list(mSorted[vNew].T), vGroup]
+
+###########################################################
+### [vEU, vAme]= Ame_Option_Table_Price(vT, vr, vs, vb, vX, vS, vCall, oCache, sEngine)
+def Ame_Option_Table_Price(vT, vr, vs, vb, vX, vS, vCall, oCache=None, sEngine='baw'):
+    '''
+    European and American prices for a table of contracts, e.g. the expiry x
+    strike x call/put rows of an option chain: one contract per element, all
+    inputs broadcast against each other, vCall True for calls and False for
+    puts.
+    
+    Contracts are grouped by their model parameters (b, r, T, sigma). The
+    normalized critical price S*/X of every group is solved once, only for
+    the sides that occur in it, scaled to each strike and scattered back to
+    the original order; the solver work scales with the number of unique
+    parameter sets rather than with the number of contracts. oCache and
+    sEngine ('baw' or 'jz') are as in Ame_Option_Price_Array.
+    '''
+    if sEngine not in ('baw', 'jz'):
+        raise ValueError("sEngine must be 'baw' or 'jz', got %r" % sEngine)
+    
+    [vT, vr, vs, vb, vX, vS, vCall]= Broadcast_Params(vT, vr, vs, vb, vX, vS, vCall)
+    vShape= vT.shape
+    [vT, vr, vs, vb, vX, vS]= [np.ravel(x) for x in (vT, vr, vs, vb, vX, vS)]
+    vCall= vCall.ravel() != 0
+    
+    [[vb_U, vr_U, vT_U, vs_U], vGroup]= Group_Params(vb, vr, vT, vs)
+    
+    #Normalized critical prices, solved only for the sides present
+    if oCache is not None:
+        [vCrit_Call, vCrit_Put]= oCache.critical_prices(vb_U, vr_U, vT_U, vs_U, 1.0)
+    else:
+        [vCrit_Call, vCrit_Put]= [np.full(len(vb_U), np.nan) for _ in range(2)]
+        for (vCrit, vSide, fSolve) in ((vCrit_Call, vCall, Critical_Call_Price),
+                                       (vCrit_Put, ~vCall, Critical_Put_Price)):
+            vPresent=              np.zeros(len(vb_U), dtype=bool)
+            vPresent[vGroup[vSide]]= True
+            vIdx=                  np.nonzero(vPresent)[0]
+            if len(vIdx) == 0:
+                continue
+            [b, r, T, s]= [x[vIdx] for x in (vb_U, vr_U, vT_U, vs_U)]
+            lSeedPrices=  SeedPrices(roots(b, r, np.inf, s), b, T, s, 1.0)
+            vCrit[vIdx]=  fSolve(lSeedPrices, roots(b, r, T, s), 1.0, b, s, T, r)
+    
+    #Scatter the group results to the contracts and price each side
+    [vq_1, vq_2]= roots(vb_U, vr_U, vT_U, vs_U)
+    [vEU, vAme]=  [np.empty(len(vT)) for _ in range(2)]
+    for (iPhi, vCrit, vSide) in ((1, vCrit_Call, vCall), (-1, vCrit_Put, ~vCall)):
+        vIdx=  np.nonzero(vSide)[0]
+        vRows= vGroup[vIdx]
+        [S, X, b, s, T, r]= [x[vIdx] for x in (vS, vX, vb, vs, vT, vr)]
+        lq=    [vq_1[vRows], vq_2[vRows]]
+        if sEngine == 'jz':
+            lPrices= Ju_Zhong_Grid(S, lq, vCrit[vRows]*X, X, b, s, T, r, iPhi)
+        elif iPhi == 1:
+            lPrices= American_Call_Grid(S, lq, vCrit[vRows]*X, X, b, s, T, r)
+        else:
+            lPrices= American_Put_Grid(S, lq, vCrit[vRows]*X, X, b, s, T, r)
+        [vEU[vIdx], vAme[vIdx]]= lPrices[:2]
+    
+    return [vEU.reshape(vShape)[()], vAme.reshape(vShape)[()]]
+
+###########################################################
+### df= Ame_Option_Table_Frame(df, oCache, sEngine)
+def Ame_Option_Table_Frame(df, oCache=None, sEngine='baw'):
+    '''
+    Ame_Option_Table_Price for a DataFrame with one contract per row in the
+    columns T, r, sigma, b, X, S and call (bool). Returns a copy with the
+    columns EU and Ame added.
+    '''
+    [vEU, vAme]= Ame_Option_Table_Price(df['T'].to_numpy(), df['r'].to_numpy(),
+                                        df['sigma'].to_numpy(), df['b'].to_numpy(),
+                                        df['X'].to_numpy(), df['S'].to_numpy(),
+                                        df['call'].to_numpy(), oCache, sEngine)
+    
+    return df.assign(EU=vEU, Ame=vAme)
+
+###########################################################
+### [mS, lCall_Greeks, lPut_Greeks]= Ame_Option_Greeks_Array(vT, vr, vs, db, iX, vS, oCache)
+def Ame_Option_Greeks_Array(vT, vr, vs, db, iX, vS, oCache=None):
+    '''
+    American option prices and analytic Greeks on the same (n_params,
+    n_spots) grid as Ame_Option_Price_Array, with the same per-row inputs.
+    lCall_Greeks and lPut_Greeks hold the price, delta, gamma, vega, theta,
+    rho and carry sensitivity.
     '''
-    lAme_Call= []
-    lAme_Put=  []
+    [vT, vr, vs, vb, vX, mS]= Grid_Params(vT, vr, vs, db, iX, vS)
+    [vq_1, vq_2]= roots(vb, vr, vT, vs)
+    if oCache is None:
+        [vCrit_Call, vCrit_Put]= Critical_Prices(vb, vr, vT, vs, vX)
+    else:
+        [vCrit_Call, vCrit_Put]= oCache.critical_prices(vb, vr, vT, vs, vX)
+    
+    [mT, mr, ms, mb, mX]= [x[:, None] for x in (vT, vr, vs, vb, vX)]
+    lq=                   [vq_1[:, None], vq_2[:, None]]
+    
+    lCall_Greeks= American_Call_Greeks(mS, lq, vCrit_Call[:, None], mX, mb, ms, mT, mr)
+    lPut_Greeks=  American_Put_Greeks(mS, lq, vCrit_Put[:, None], mX, mb, ms, mT, mr)
+    
+    return [mS, lCall_Greeks, lPut_Greeks]
+
+###########################################################
+### [vAme, vVega]= Ame_Price_Vega(vS, vX, vT, vr, vb, vs, vCall)
+def Ame_Price_Vega(vS, vX, vT, vr, vb, vs, vCall):
+    '''
+    American price and analytic vega of one option per element, calls where
+    vCall is True and puts elsewhere. Only the boundary of the requested side
+    is solved.
+    '''
+    [vS, vX, vT, vr, vb, vs]= Broadcast_Params(vS, vX, vT, vr, vb, vs)
+    vCall= np.broadcast_to(vCall, vS.shape).astype(bool)
+    vAme=  np.empty(vS.shape)
+    vVega= np.empty(vS.shape)
+    
+    lq_inf= roots(vb, vr, np.inf, vs)
+    lq=     roots(vb, vr, vT, vs)
+    for (iPhi, vSide) in ((1, vCall), (-1, ~vCall)):
+        if not vSide.any():
+            continue
+        lq_Side=     [lq[0][vSide], lq[1][vSide]]
+        lSeedPrices= SeedPrices([lq_inf[0][vSide], lq_inf[1][vSide]], vb[vSide],
+                                vT[vSide], vs[vSide], vX[vSide])
+        lArgs=       [vX[vSide], vb[vSide], vs[vSide], vT[vSide], vr[vSide]]
+        if iPhi == 1:
+            vCrit= Critical_Call_Price(lSeedPrices, lq_Side, *lArgs)
+        else:
+            vCrit= Critical_Put_Price(lSeedPrices, lq_Side, *lArgs)
+        lGreeks= American_Greeks(vS[vSide], lq_Side, vCrit, *lArgs, iPhi)
+        vAme[vSide]=  lGreeks[0]
+        vVega[vSide]= lGreeks[3]
+    
+    return [vAme, vVega]
 
-    for i in range(len(vT)):
-        dT= vT[i]
-        dr= vr[i]
-        ds= vs[i]
+###########################################################
+### [vSigma, viStatus]= Ame_Implied_Vol(vPrice, vS, vX, vT, vr, db, vCall, dTol, iMax_Iter, dVol_Min, dVol_Max)
+def Ame_Implied_Vol(vPrice, vS, vX, vT, vr, db, vCall, dTol=1e-8, iMax_Iter=100,
+                    dVol_Min=1e-3, dVol_Max=5.0):
+    '''
+    Implied volatilities of American option quotes under the quadratic
+    approximation, one per element (calls where vCall is True, puts
+    elsewhere). All inputs broadcast against each other.
+    
+    The initial guess inverts the European price, which is a lower bound of
+    the American one, by Newton steps from the Manaster-Koehler point. The
+    American price is then inverted by Newton steps with the analytic vega,
+    falling back to bisection whenever a step leaves the current bracket.
+    
+    viStatus per quote: 0 converged (|price error| < dTol), 1 no
+    convergence within iMax_Iter, 2 price below the value at dVol_Min,
+    3 price above the value at dVol_Max, 4 invalid input. Quotes at intrinsic
+    value inside the exercise region, or with negligible vega, are matched
+    within dTol by a whole range of volatilities; any of them may be returned.
+    '''
+    [vPrice, vS, vX, vT, vr, vb]= Broadcast_Params(vPrice, vS, vX, vT, vr, db)
+    vCall=    np.broadcast_to(vCall, vS.shape).astype(bool).ravel()
+    vShape=   vS.shape
+    [vPrice, vS, vX, vT, vr, vb]= [x.ravel() for x in (vPrice, vS, vX, vT, vr, vb)]
+    vPhi=     np.where(vCall, 1.0, -1.0)
+    vSigma=   np.full(vS.shape, np.nan)
+    viStatus= np.full(vS.shape, 1)
+    
+    vValid= np.isfinite(vPrice) & (vS > 0) & (vX > 0) & (vT > 0) & np.isfinite(vr + vb)
+    viStatus[~vValid]= 4
+    
+    #Reject quotes outside the attainable price range
+    vLo= np.full(vS.shape, dVol_Min)
+    vHi= np.full(vS.shape, dVol_Max)
+    [vP_Lo, _]= Ame_Price_Vega(vS, vX, vT, vr, vb, vLo, vCall)
+    [vP_Hi, _]= Ame_Price_Vega(vS, vX, vT, vr, vb, vHi, vCall)
+    viStatus[vValid & (vPrice < vP_Lo - dTol)]= 2
+    viStatus[vValid & (vPrice > vP_Hi + dTol)]= 3
+    vActive= vValid & (viStatus == 1)
+    
+    #Initial guess from the European price
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vGuess= np.sqrt(2*np.abs(np.log(vS/vX) + vb*vT)/vT)
+    vGuess= np.clip(np.where(np.isfinite(vGuess), vGuess, 0.3), 0.05, 1.0)
+    for _ in range(5):
+        d_1=   (np.log(vS/vX) + (vb + 0.5*vGuess**2)*vT)/(vGuess*np.sqrt(vT))
+        d_2=   d_1 - vGuess*np.sqrt(vT)
+        vEU=   vPhi*(vS*np.exp((vb-vr)*vT)*Norm_CDF(vPhi*d_1)
+                     - vX*np.exp(-vr*vT)*Norm_CDF(vPhi*d_2))
+        vVega= vS*np.exp((vb-vr)*vT)*Norm_PDF(d_1)*np.sqrt(vT)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vStep= (vEU - vPrice)/vVega
+        vGuess= np.where(np.isfinite(vStep), vGuess - vStep, vGuess)
+        vGuess= np.clip(vGuess, dVol_Min, dVol_Max)
+    vSigma[vActive]= vGuess[vActive]
+    
+    #Safeguarded Newton iterations on the American price
+    iIter= 0
+    while vActive.any() and iIter < iMax_Iter:
+        vIdx=   vActive.copy()
+        dSigma= vSigma[vIdx]
+        [vAme, vVega]= Ame_Price_Vega(vS[vIdx], vX[vIdx], vT[vIdx], vr[vIdx],
+                                      vb[vIdx], dSigma, vCall[vIdx])
+        vDiff= vAme - vPrice[vIdx]
         
-        lq_inf=      roots(db, dr, np.inf, ds)
-        lSeedPrices= SeedPrices(lq_inf, db, dT, ds, iX)
+        vLo[vIdx]= np.where(vDiff < 0, dSigma, vLo[vIdx])
+        vHi[vIdx]= np.where(vDiff > 0, dSigma, vHi[vIdx])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vNext= dSigma - vDiff/vVega
+        vBisect= ~((vNext > vLo[vIdx]) & (vNext < vHi[vIdx]))
+        vNext=   np.where(vBisect, (vLo[vIdx] + vHi[vIdx])/2, vNext)
         
-        lq=         roots(db, dr, dT, ds)
-        dCrit_Call= Critical_Call_Price(lSeedPrices, lq, iX, db, ds, dT, dr)
-        dCrit_Put=  Critical_Put_Price(lSeedPrices, lq, iX, db, ds, dT, dr)
+        vDone=  (np.abs(vDiff) < dTol) | (vHi[vIdx] - vLo[vIdx] < 1e-12)
+        vSigma[vIdx]= np.where(vDone, dSigma, vNext)
+        viStatus[vIdx]= np.where(vDone, 0, 1)
+        vActive[vIdx]= ~vDone
+        iIter+= 1
+    
+    return [vSigma.reshape(vShape)[()], viStatus.reshape(vShape)[()]]
+
+###########################################################
+### [vEU_Call, vAme_Call, vEU_Put, vAme_Put]= Ame_Option_Price_Rows(vT, vr, vs, vb, vX, vS, sBackend, sSide)
+def Ame_Option_Price_Rows(vT, vr, vs, vb, vX, vS, sBackend=None, sSide='both'):
+    '''
+    European and American call and put prices with one option per element:
+    all inputs broadcast against each other, no grid is formed. sBackend
+    overrides the module backend; sSide is as in Ame_Option_Price_Array.
+    '''
+    [bCall, bPut]=           Side_Flags(sSide)
+    [vT, vr, vs, vb, vX, vS]= Broadcast_Params(vT, vr, vs, vb, vX, vS)
+    oKernels= Numba_Kernels(sBackend)
+    if oKernels is not None:
+        lPrices= oKernels.Ame_Option_Price_Rows(vT.ravel(), vr.ravel(), vs.ravel(), vb.ravel(),
+                                                vX.ravel(), vS.ravel(), 0.00001, 1000,
+                                                bCall, bPut)
+        return [x.reshape(vT.shape) if bSide else None
+                for (x, bSide) in zip(lPrices, (bCall, bCall, bPut, bPut))]
+    
+    lq=                      roots(vb, vr, vT, vs)
+    [vCrit_Call, vCrit_Put]= Critical_Prices(vb, vr, vT, vs, vX, sSide=sSide)
+    
+    [vEU_Call, vAme_Call, vEU_Put, vAme_Put]= [None]*4
+    if bCall:
+        [vEU_Call, vAme_Call, _]= American_Call_Grid(vS, lq, vCrit_Call, vX, vb, vs, vT, vr)
+    if bPut:
+        [vEU_Put, vAme_Put, _]=   American_Put_Grid(vS, lq, vCrit_Put, vX, vb, vs, vT, vr)
+    
+    return [vEU_Call, vAme_Call, vEU_Put, vAme_Put]
+
+###########################################################
+### oChunks= Parquet_Chunks(sIn, iChunk, iSkip)
+def Parquet_Chunks(sIn, iChunk, iSkip=0):
+    '''
+    DataFrames of at most iChunk rows read lazily from the parquet file sIn
+    (needs pyarrow), leaving out its first iSkip rows.
+    '''
+    import pyarrow.parquet as pq
+    for oBatch in pq.ParquetFile(sIn).iter_batches(batch_size=iChunk):
+        if iSkip >= oBatch.num_rows:
+            iSkip-= oBatch.num_rows
+            continue
+        yield oBatch.slice(iSkip).to_pandas()
+        iSkip= 0
+
+###########################################################
+### dSummary= Ame_Option_Price_Stream(sIn, sOut, iChunk, bResume, bVerbose)
+def Ame_Option_Price_Stream(sIn, sOut, iChunk=100000, bResume=False, bVerbose=True):
+    '''
+    Price an option file of any size chunk by chunk with bounded memory.
+    
+    sIn is a .csv or .parquet file (parquet needs pyarrow) with one option
+    per row in the columns T, r, sigma, b, X and S. sOut is a csv file with
+    the input columns followed by EU_Call, Ame_Call, EU_Put and Ame_Put,
+    appended after every chunk. Progress is committed to sOut + '.progress'
+    after each chunk; with bResume= True a previous run continues from the
+    last committed chunk. Returns a summary of rows, chunks and throughput.
+    '''
+    sProgress= sOut + '.progress'
+    dState=    {'chunks': 0, 'rows': 0, 'bytes': 0}
+    if bResume and os.path.exists(sProgress):
+        with open(sProgress) as oFile:
+            dState= json.load(oFile)
+    
+    #Drop anything written after the last committed chunk
+    if os.path.exists(sOut) and dState['chunks'] > 0:
+        with open(sOut, 'r+b') as oFile:
+            oFile.truncate(dState['bytes'])
+    elif os.path.exists(sOut):
+        os.remove(sOut)
+    
+    #Resume after the committed rows, whatever chunk size the earlier run used
+    iDone= dState['rows']
+    if sIn.endswith('.parquet'):
+        oChunks= Parquet_Chunks(sIn, iChunk, iDone)
+    else:
+        oChunks= pd.read_csv(sIn, chunksize=iChunk,
+                             skiprows=lambda i: 0 < i <= iDone)
+    
+    dStart= time.perf_counter()
+    iRows=  0
+    for df in oChunks:
+        [vEU_Call, vAme_Call, vEU_Put, vAme_Put]= Ame_Option_Price_Rows(
+            df['T'].to_numpy(), df['r'].to_numpy(), df['sigma'].to_numpy(),
+            df['b'].to_numpy(), df['X'].to_numpy(), df['S'].to_numpy())
+        df= df.assign(EU_Call=vEU_Call, Ame_Call=vAme_Call,
+                      EU_Put=vEU_Put, Ame_Put=vAme_Put)
+        
+        with open(sOut, 'a', newline='') as oFile:
+            df.to_csv(oFile, header=dState['bytes'] == 0, index=False)
+            dState['bytes']= oFile.tell()
+        dState['chunks']+= 1
+        dState['rows']+=   len(df)
+        with open(sProgress + '.tmp', 'w') as oFile:
+            json.dump(dState, oFile)
+        os.replace(sProgress + '.tmp', sProgress)
         
-        for j in range(len(vS)):
-            dS= vS[j]
-            lAme_Call.append(American_Call(dS, lq, dCrit_Call, iX, db, ds, dT, dr))
-            lAme_Put.append(American_Put(dS, lq, dCrit_Put, iX, db, ds, dT, dr))
+        iRows+=   len(df)
+        dElapsed= time.perf_counter() - dStart
+        if bVerbose:
+            print('Chunk %d: %d rows in total, %.0f rows/s'
+                  % (dState['chunks'], dState['rows'], iRows/dElapsed))
     
-    #Transpose list:
-    lAme_Call= list(map(list, zip(*lAme_Call)))
-    lAme_Put=  list(map(list, zip(*lAme_Put)))
+    dElapsed= time.perf_counter() - dStart
+    return {'chunks':       dState['chunks'],
+            'rows':         dState['rows'],
+            'rows_run':     iRows,
+            'seconds':      dElapsed,
+            'rows_per_sec': iRows/dElapsed if dElapsed > 0 else np.nan}
+
+###########################################################
+### lAme_Option_prices= Ame_Option_Price(vT, vr, vs, db, iX, vS, oCache, iWorkers, iChunk, sEngine, sSide, bSymmetry)
+def Ame_Option_Price(vT, vr, vs, db, iX, vS, oCache=None, iWorkers=1, iChunk=None,
+                     sEngine='baw', sSide='both', bSymmetry=False):
+    ''' 
+    Get list of American Option prices throughout the quadratic
+    approximation method.
     
-    lS=        lAme_Call[0]
-    lEU_Call=  lAme_Call[1]
-    lEU_Put=   lAme_Put[0]
-    lAme_Call= lAme_Call[2]
-    lAme_Put=  lAme_Put[1]
+    Flattened and rounded to two decimals for presentation; use
+    Ame_Option_Price_Array for the full precision arrays. With sSide= 'call'
+    or 'put' the lists of the other side are None.
+    '''
+    [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]= Ame_Option_Price_Array(vT, vr, vs, db, iX, vS,
+                                                                           oCache, iWorkers, iChunk,
+                                                                           sEngine=sEngine,
+                                                                           sSide=sSide,
+                                                                           bSymmetry=bSymmetry)
     
-    lEU_Call=  [round(x,2) for x in lEU_Call]
-    lEU_Put=   [round(x,2) for x in lEU_Put]
-    lAme_Call= [round(x,2) for x in lAme_Call]
-    lAme_Put=  [round(x,2) for x in lAme_Put]
+    lS= list(np.broadcast_to(vS, mS.shape).ravel())
+    [lEU_Call, lAme_Call, lEU_Put, lAme_Put]= [None if x is None else np.round(x, 2).ravel().tolist()
+                                               for x in (mEU_Call, mAme_Call, mEU_Put, mAme_Put)]
     
     return [lS, lEU_Call, lAme_Call, lEU_Put, lAme_Put]
     
@@ -234,14 +2127,15 @@ def main():
 
     
     # Initialisation
-    [lS, lEU_Call, lAme_Call, lEU_Put, lAme_Put]= Ame_Option_Price(vT, vr, vs, db, iX, vS)
+    [mS, mEU_Call, mAme_Call, mEU_Put, mAme_Put]= Ame_Option_Price_Array(vT, vr, vs, db, iX, vS)
     
     # Output
-    df= pd.DataFrame({'Commodity Price S': lS,
-                      'European c(S, T)':  lEU_Call,
-                      'American C(S, T)':  lAme_Call,
-                      'European p(S, T)':  lEU_Put,
-                      'American P(S, T)':  lAme_Put})
+    df= pd.DataFrame({'Commodity Price S': mS.ravel(),
+                      'European c(S, T)':  mEU_Call.ravel(),
+                      'American C(S, T)':  mAme_Call.ravel(),
+                      'European p(S, T)':  mEU_Put.ravel(),
+                      'American P(S, T)':  mAme_Put.ravel()})
+    df= df.round(2)
     
     table= df.to_latex(index=False)
     text_file = open("table.txt", "w")
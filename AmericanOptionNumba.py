@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Numba-compiled kernels of the quadratic approximation (Barone-Adesi and
+Whaley, 1987) used by AmericanOptionCommodities when the 'numba' backend is
+selected.
+
+Every kernel is a scalar nopython function mirroring its NumPy counterpart in
+AmericanOptionCommodities; the batch entry points loop over options with
+prange. Compiled code is cached on disk (cache=True), so only the first run on
+a machine pays the compilation time. Importing this module requires numba.
+"""
+###########################################################
+### Imports
+import math
+
+import numpy as np
+from numba import njit, prange
+
+###########################################################
+### dN= Norm_CDF(dx)
+@njit(cache=True, error_model='numpy')
+def Norm_CDF(dx):
+    '''
+    Standard normal cumulative distribution function N(x).
+    '''
+    return 0.5*math.erfc(-dx/math.sqrt(2.0))
+
+###########################################################
+### dn= Norm_PDF(dx)
+@njit(cache=True, error_model='numpy')
+def Norm_PDF(dx):
+    '''
+    Standard normal density function n(x).
+    '''
+    return math.exp(-0.5*dx*dx)/math.sqrt(2*math.pi)
+
+###########################################################
+### (bNo_Call, bNo_Put)= No_Early_Exercise(db, dr)
+@njit(cache=True, error_model='numpy')
+def No_Early_Exercise(db, dr):
+    '''
+    Whether the call (b >= max(r, 0)) and the put (r <= 0 and b <= 0) are
+    never exercised early.
+    '''
+    return (db >= max(dr, 0.0), dr <= 0 and db <= 0)
+
+###########################################################
+### (q_1, q_2)= roots(db, dr, dT, ds)
+@njit(cache=True, error_model='numpy')
+def roots(db, dr, dT, ds):
+    '''
+    roots of equation (13), closed form; dT= np.inf gives the perpetual roots.
+    '''
+    dN= 2*db/ds**2
+    if dr == 0:
+        dM_K= 2/(ds**2*dT)
+    else:
+        dM_K= 2*dr/ds**2/(-math.expm1(-dr*dT))
+
+    b=  dN - 1
+    dD= math.sqrt(b**2 + 4*dM_K)
+    if b >= 0:
+        q_1= -(b + dD)/2
+        q_2= -dM_K/q_1 if q_1 != 0 else 0.0
+    else:
+        q_2= (dD - b)/2
+        q_1= -dM_K/q_2 if q_2 != 0 else 0.0
+
+    return (q_1, q_2)
+
+###########################################################
+### (dCall_seed, dPut_seed)= SeedPrices(q_1, q_2, db, dT, ds, dX)
+@njit(cache=True, error_model='numpy')
+def SeedPrices(q_1, q_2, db, dT, ds, dX):
+    '''
+    Initiation values of the iterative procedure (Section II, A), from the
+    perpetual roots q_1 and q_2.
+    '''
+    #eq (30) and (32)
+    dCall_S_inf= dX/(1-1/q_2)
+    dPut_S_inf=  dX/(1-1/q_1)
+
+    dh_1= min((db*dT - 2*ds*math.sqrt(dT))*(dX/(dX-dPut_S_inf)), 0.0)
+    dh_2= min(-(db*dT + 2*ds*math.sqrt(dT))*(dX/(dCall_S_inf-dX)), 0.0)
+
+    #eq (31) and (33)
+    dCall_seed= dX + (dCall_S_inf - dX)*(1 - math.exp(dh_2))
+    dPut_seed=  dPut_S_inf + (dX - dPut_S_inf)*math.exp(dh_1)
+
+    return (dCall_seed, dPut_seed)
+
+###########################################################
+### dCrit_Call= Critical_Call_Price(dSeed, q_2, dX, db, ds, dT, dr, dTol, iMax_Iter)
+@njit(cache=True, error_model='numpy')
+def Critical_Call_Price(dSeed, q_2, dX, db, ds, dT, dr, dTol, iMax_Iter):
+    '''
+    Critical commodity price of the call, eq (26)-(28); infinite where the
+    call is never exercised early.
+    '''
+    if No_Early_Exercise(db, dr)[0]:
+        return np.inf
+
+    dCrit=  dSeed
+    dSqrt=  math.sqrt(dT)
+    dCarry= math.exp((db-dr)*dT)
+    dDisc=  math.exp(-dr*dT)
+    for _ in range(iMax_Iter):
+        d_1= (math.log(dCrit/dX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+        d_2= d_1 - ds*dSqrt
+
+        dRHS= dCrit*dCarry*Norm_CDF(d_1) - dX*dDisc*Norm_CDF(d_2)\
+            + (1-dCarry*Norm_CDF(d_1))*dCrit/q_2
+        dError= abs(dCrit - dX - dRHS)/dX
+
+        db_i= dCarry*Norm_CDF(d_1)*(1 - 1/q_2)\
+            + (1 - dCarry*Norm_PDF(d_1)/(ds*dSqrt))/q_2
+        dCrit= (dX + dRHS - db_i*dCrit)/(1 - db_i)
+        if not dError > dTol:
+            break
+
+    #With r < 0 eq (26) can lack a root above X
+    if dr < 0 and not dCrit > dX:
+        return np.inf
+    return dCrit
+
+###########################################################
+### dCrit_Put= Critical_Put_Price(dSeed, q_1, dX, db, ds, dT, dr, dTol, iMax_Iter)
+@njit(cache=True, error_model='numpy')
+def Critical_Put_Price(dSeed, q_1, dX, db, ds, dT, dr, dTol, iMax_Iter):
+    '''
+    Critical commodity price of the put, eq (24) with its Newton step; zero
+    where the put is never exercised early.
+    '''
+    if No_Early_Exercise(db, dr)[1]:
+        return 0.0
+
+    dCrit=  dSeed
+    dSqrt=  math.sqrt(dT)
+    dCarry= math.exp((db-dr)*dT)
+    dDisc=  math.exp(-dr*dT)
+    for _ in range(iMax_Iter):
+        d_1= (math.log(dCrit/dX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+        d_2= d_1 - ds*dSqrt
+
+        dRHS= dX*dDisc*Norm_CDF(-d_2) - dCrit*dCarry*Norm_CDF(-d_1)\
+            - (1-dCarry*Norm_CDF(-d_1))*dCrit/q_1
+        dError= abs(dX - dCrit - dRHS)/dX
+
+        db_i= -dCarry*Norm_CDF(-d_1)*(1 - 1/q_1)\
+            - (1 + dCarry*Norm_PDF(-d_1)/(ds*dSqrt))/q_1
+        dCrit= (dX - dRHS + db_i*dCrit)/(1 + db_i)
+        if not dError > dTol:
+            break
+
+    #With r < 0 eq (24) can lack a root below X
+    if dr < 0 and not dCrit < dX:
+        return 0.0
+    return dCrit
+
+###########################################################
+### (dEU_Call, dAme_Call)= American_Call(dS, q_2, dCrit_Call, dX, db, ds, dT, dr)
+@njit(cache=True, error_model='numpy')
+def American_Call(dS, q_2, dCrit_Call, dX, db, ds, dT, dr):
+    '''
+    European and American Call option prices, eq (5) and (20).
+    '''
+    dSqrt=  math.sqrt(dT)
+    dCarry= math.exp((db-dr)*dT)
+    d_1S=   (math.log(dS/dX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+    dEU=    dS*dCarry*Norm_CDF(d_1S) - dX*math.exp(-dr*dT)*Norm_CDF(d_1S - ds*dSqrt)
+    if dS >= dCrit_Call:
+        return (dEU, dS - dX)
+    if No_Early_Exercise(db, dr)[0] or dCrit_Call == np.inf:
+        return (dEU, dEU)
+
+    d_1= (math.log(dCrit_Call/dX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+    dA_2= (dCrit_Call/q_2)*(1-dCarry*Norm_CDF(d_1))
+    return (dEU, dEU + dA_2*(dS/dCrit_Call)**q_2)
+
+###########################################################
+### (dEU_Put, dAme_Put)= American_Put(dS, q_1, dCrit_Put, dX, db, ds, dT, dr)
+@njit(cache=True, error_model='numpy')
+def American_Put(dS, q_1, dCrit_Put, dX, db, ds, dT, dr):
+    '''
+    European and American Put option prices, eq (6) and (25).
+    '''
+    dSqrt=  math.sqrt(dT)
+    dCarry= math.exp((db-dr)*dT)
+    d_1S=   (math.log(dS/dX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+    dEU=    dX*math.exp(-dr*dT)*Norm_CDF(-(d_1S - ds*dSqrt)) - dS*dCarry*Norm_CDF(-d_1S)
+    if dS <= dCrit_Put:
+        return (dEU, dX - dS)
+    if No_Early_Exercise(db, dr)[1] or dCrit_Put == 0:
+        return (dEU, dEU)
+
+    d_1= (math.log(dCrit_Put/dX) + (db + 0.5*ds**2)*dT)/(ds*dSqrt)
+    dA_1= -(dCrit_Put/q_1)*(1-dCarry*Norm_CDF(-d_1))
+    return (dEU, dEU + dA_1*(dS/dCrit_Put)**q_1)
+
+###########################################################
+### (dCrit_Call, dCrit_Put, q_1, q_2)= Solve_Row(db, dr, dT, ds, dX, dTol, iMax_Iter, bCall, bPut)
+@njit(cache=True, error_model='numpy')
+def Solve_Row(db, dr, dT, ds, dX, dTol, iMax_Iter, bCall, bPut):
+    '''
+    Roots, seeds and the critical prices of one parameter row; a side that
+    is not asked for (bCall, bPut) is not solved and gets NaN.
+    '''
+    (q_1_inf, q_2_inf)=      roots(db, dr, np.inf, ds)
+    (q_1, q_2)=              roots(db, dr, dT, ds)
+    (dCall_seed, dPut_seed)= SeedPrices(q_1_inf, q_2_inf, db, dT, ds, dX)
+
+    dCrit_Call= np.nan
+    dCrit_Put=  np.nan
+    if bCall:
+        dCrit_Call= Critical_Call_Price(dCall_seed, q_2, dX, db, ds, dT, dr, dTol, iMax_Iter)
+    if bPut:
+        dCrit_Put=  Critical_Put_Price(dPut_seed, q_1, dX, db, ds, dT, dr, dTol, iMax_Iter)
+
+    return (dCrit_Call, dCrit_Put, q_1, q_2)
+
+###########################################################
+### (vCrit_Call, vCrit_Put)= Critical_Prices(vb, vr, vT, vs, vX, dTol, iMax_Iter, bCall, bPut)
+@njit(cache=True, parallel=True, error_model='numpy')
+def Critical_Prices(vb, vr, vT, vs, vX, dTol, iMax_Iter, bCall, bPut):
+    '''
+    Critical call and put prices of 1-d arrays of parameter rows, NaN for a
+    side that is not asked for.
+    '''
+    iN=         len(vb)
+    vCrit_Call= np.empty(iN)
+    vCrit_Put=  np.empty(iN)
+    for i in prange(iN):
+        (vCrit_Call[i], vCrit_Put[i], _, _)= Solve_Row(vb[i], vr[i], vT[i], vs[i],
+                                                       vX[i], dTol, iMax_Iter, bCall, bPut)
+
+    return (vCrit_Call, vCrit_Put)
+
+###########################################################
+### (mEU_Call, mAme_Call, mEU_Put, mAme_Put)= Ame_Option_Price_Array(vT, vr, vs, vb, vX, mS, dTol, iMax_Iter, bCall, bPut)
+@njit(cache=True, parallel=True, error_model='numpy')
+def Ame_Option_Price_Array(vT, vr, vs, vb, vX, mS, dTol, iMax_Iter, bCall, bPut):
+    '''
+    Option prices of shape (n_params, n_spots) for 1-d arrays of parameter
+    rows (T, r, sigma, b, X) and the (n_params, n_spots) commodity prices.
+    Only the sides asked for (bCall, bPut) are filled in.
+    '''
+    iN= len(vT)
+    iM= mS.shape[1]
+    mEU_Call=  np.empty((iN, iM))
+    mAme_Call= np.empty((iN, iM))
+    mEU_Put=   np.empty((iN, iM))
+    mAme_Put=  np.empty((iN, iM))
+    for i in prange(iN):
+        (dCrit_Call, dCrit_Put, q_1, q_2)= Solve_Row(vb[i], vr[i], vT[i], vs[i],
+                                                     vX[i], dTol, iMax_Iter, bCall, bPut)
+        for j in range(iM):
+            if bCall:
+                (mEU_Call[i, j], mAme_Call[i, j])= American_Call(mS[i, j], q_2, dCrit_Call,
+                                                                 vX[i], vb[i], vs[i], vT[i], vr[i])
+            if bPut:
+                (mEU_Put[i, j], mAme_Put[i, j])=   American_Put(mS[i, j], q_1, dCrit_Put,
+                                                                vX[i], vb[i], vs[i], vT[i], vr[i])
+
+    return (mEU_Call, mAme_Call, mEU_Put, mAme_Put)
+
+###########################################################
+### (vEU_Call, vAme_Call, vEU_Put, vAme_Put)= Ame_Option_Price_Rows(vT, vr, vs, vb, vX, vS, dTol, iMax_Iter, bCall, bPut)
+@njit(cache=True, parallel=True, error_model='numpy')
+def Ame_Option_Price_Rows(vT, vr, vs, vb, vX, vS, dTol, iMax_Iter, bCall, bPut):
+    '''
+    Option prices with one option per element of equally long 1-d arrays,
+    filled in only for the sides asked for (bCall, bPut).
+    '''
+    iN= len(vT)
+    vEU_Call=  np.empty(iN)
+    vAme_Call= np.empty(iN)
+    vEU_Put=   np.empty(iN)
+    vAme_Put=  np.empty(iN)
+    for i in prange(iN):
+        (dCrit_Call, dCrit_Put, q_1, q_2)= Solve_Row(vb[i], vr[i], vT[i], vs[i],
+                                                     vX[i], dTol, iMax_Iter, bCall, bPut)
+        if bCall:
+            (vEU_Call[i], vAme_Call[i])= American_Call(vS[i], q_2, dCrit_Call, vX[i],
+                                                       vb[i], vs[i], vT[i], vr[i])
+        if bPut:
+            (vEU_Put[i], vAme_Put[i])=   American_Put(vS[i], q_1, dCrit_Put, vX[i],
+                                                      vb[i], vs[i], vT[i], vr[i])
+
+    return (vEU_Call, vAme_Call, vEU_Put, vAme_Put)